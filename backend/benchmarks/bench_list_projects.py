@@ -0,0 +1,109 @@
+"""Compare the legacy and current read paths of GET /api/projects/.
+
+Seeds a throwaway SQLite database with projects that have hundreds of
+members, then times the old joinedload + per-member model_validate +
+response_model path against project.service/project.router as they are now.
+
+    python benchmarks/bench_list_projects.py --projects 20 --members 300
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--members", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import event, insert
+    from sqlalchemy.orm import joinedload
+    from core.database import SessionLocal, init_db
+    from core.models import User
+    from core.schemas import UserRead
+    from project.models import Project, ProjectUserRole
+    from project.schemas import ProjectRead, ProjectUserRoleRead
+    from project.service import get_projects_for_user
+    from project.router import project_list_response
+
+    engine = init_db()
+    db = SessionLocal()
+    db.execute(insert(User), [
+        {"email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"User {i}", "role": "user"}
+        for i in range(args.members)
+    ])
+    db.execute(insert(Project), [{"name": f"Project {i}", "description": "benchmark"} for i in range(args.projects)])
+    db.execute(insert(ProjectUserRole), [
+        {"user_id": u + 1, "project_id": p + 1, "role": "owner" if u == 0 else "developer"}
+        for p in range(args.projects) for u in range(args.members)
+    ])
+    db.commit()
+    db.close()
+
+    def legacy(db):
+        projects = (
+            db.query(Project)
+            .options(joinedload(Project.user_roles).joinedload(ProjectUserRole.user))
+            .join(ProjectUserRole)
+            .filter(ProjectUserRole.user_id == 1)
+            .all()
+        )
+        result = [
+            ProjectRead(
+                id=p.id, name=p.name, description=p.description, created_at=p.created_at, updated_at=p.updated_at,
+                users=[
+                    ProjectUserRoleRead(user_id=ur.user_id, project_id=ur.project_id, role=ur.role,
+                                        user=UserRead.model_validate(ur.user) if ur.user else None)
+                    for ur in p.user_roles
+                ],
+            )
+            for p in projects
+        ]
+        # What FastAPI does with response_model=List[ProjectRead]
+        validated = TypeAdapter(List[ProjectRead]).validate_python(jsonable_encoder(result))
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def current(db):
+        projects = get_projects_for_user(db, user_id=1, limit=args.projects + 1)
+        return project_list_response(projects, args.projects, None).body
+
+    stats = {"statements": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        stats["statements"] += 1
+
+    event.listen(engine, "after_cursor_execute", on_execute)
+
+    report = {"projects": args.projects, "members_per_project": args.members, "iterations": args.iterations}
+    outputs = {}
+    for name, fn in (("legacy", legacy), ("current", current)):
+        stats["statements"] = 0
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            db = SessionLocal()
+            try:
+                outputs[name] = fn(db)
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - start
+        report[name] = {
+            "ms_per_request": round(elapsed / args.iterations * 1000, 2),
+            "statements_per_request": stats["statements"] / args.iterations,
+        }
+    report["speedup"] = round(report["legacy"]["ms_per_request"] / report["current"]["ms_per_request"], 2)
+    report["same_payload"] = json.loads(outputs["legacy"]) == json.loads(outputs["current"])
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure worker import and cold-start time.
+
+Each run starts a fresh interpreter that imports `main`, runs the lifespan
+startup and serves GET /live, and reports medians over --runs:
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --app-dir /path/to/other/checkout/backend
+
+The database (SQLite unless --db-url is given) is created once up front with
+`python -m core.cli create` when the checkout has it.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = """
+import json, time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.get("/live")
+    served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+}))
+"""
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    parser.add_argument("--db-url")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DB_URL=args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+    env.setdefault("HASH_EXECUTOR", "thread")
+    if os.path.exists(os.path.join(args.app_dir, "core", "cli.py")):
+        subprocess.run([sys.executable, "-m", "core.cli", "create"], cwd=args.app_dir, env=env, check=True, capture_output=True)
+
+    samples = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", CHILD], cwd=args.app_dir, env=env, check=True, capture_output=True, text=True)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample["process_ms"] = (time.perf_counter() - start) * 1000
+        samples.append(sample)
+
+    report = {"runs": args.runs, "app_dir": os.path.abspath(args.app_dir)}
+    for key in ("import_ms", "startup_ms", "first_request_ms", "process_ms"):
+        report[key] = round(statistics.median(s[key] for s in samples), 1)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
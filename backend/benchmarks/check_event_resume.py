@@ -0,0 +1,75 @@
+"""Check that a quiet change-feed client can resume without losing events.
+
+Runs the app in-process against a throwaway SQLite database and walks the
+reconnect path of GET /api/projects/events: a stream that sees no events is
+closed by the server after EVENTS_MAX_STREAM_SECONDS, a project is updated
+while no stream is open, and the reconnect with the id the first stream
+handed out must replay that update without a reset. Exits non-zero on
+failure.
+
+    python benchmarks/check_event_resume.py
+    DB_MODE=async python benchmarks/check_event_resume.py
+"""
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def parse_stream(body: str):
+    # [(id, event type or None, data)] per SSE block; comments and retry lines are skipped
+    blocks = []
+    for block in body.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            name, _, value = line.partition(": ")
+            if name in ("id", "event", "data"):
+                fields[name] = value
+        if fields:
+            blocks.append((fields.get("id"), fields.get("event"), fields.get("data")))
+    return blocks
+
+def main() -> int:
+    os.environ.setdefault("DB_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'events.db')}")
+    os.environ.setdefault("HASH_EXECUTOR", "thread")
+    os.environ.setdefault("DB_AUTO_MIGRATE", "true")
+    os.environ["EVENTS_MAX_STREAM_SECONDS"] = "1"
+    os.environ["EVENTS_KEEPALIVE_SECONDS"] = "0.5"
+    sys.path.insert(0, BACKEND)
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    failures = []
+    with TestClient(app_main.app) as client:
+        client.post("/api/auth/register", json={"email": "events@example.com", "password": "pw"})
+        token = client.post("/api/auth/login", json={"email": "events@example.com", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        project_id = client.post("/api/projects/", json={"name": "Resume check"}, headers=headers).json()["id"]
+
+        # 1. A quiet stream: no events, closed by the server on the time limit
+        first = parse_stream(client.get("/api/projects/events", headers=headers).text)
+        ids = [event_id for event_id, _, _ in first if event_id]
+        if not ids:
+            failures.append("quiet stream handed out no id to resume from")
+        if any(event for _, event, _ in first):
+            failures.append(f"quiet stream sent events: {first}")
+
+        # 2. A change while no stream is open
+        client.put(f"/api/projects/{project_id}", json={"name": "Resumed"}, headers=headers)
+
+        # 3. Reconnect the way EventSource does
+        if ids:
+            second = parse_stream(client.get("/api/projects/events", headers={**headers, "Last-Event-ID": ids[-1]}).text)
+            events = [event for _, event, _ in second if event]
+            if "reset" in events:
+                failures.append("reconnect got a reset instead of a replay")
+            if "project.updated" not in events:
+                failures.append(f"update made between streams was not replayed: {second}")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    print("ok" if not failures else f"{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Diff two load_suite.py reports endpoint by endpoint.
+
+    python benchmarks/compare_runs.py before.json after.json
+
+Prints a JSON object with both values and the relative change for every
+metric; negative changes in latency and SQL statements are improvements.
+"""
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "sql_statements_per_request", "errors")
+
+def diff(before: dict, after: dict) -> dict:
+    result = {}
+    for metric in METRICS:
+        if metric not in before or metric not in after:
+            continue
+        old, new = before[metric], after[metric]
+        result[metric] = {
+            "before": old,
+            "after": new,
+            "change_pct": round((new - old) / old * 100, 1) if old else None,
+        }
+    return result
+
+def main() -> None:
+    if len(sys.argv) != 3:
+        sys.exit("usage: compare_runs.py BEFORE.json AFTER.json")
+    with open(sys.argv[1]) as f:
+        before = json.load(f)
+    with open(sys.argv[2]) as f:
+        after = json.load(f)
+    if before["config"] != after["config"]:
+        print("warning: runs used different workload settings", file=sys.stderr)
+    report = {"overall": diff(before["overall"], after["overall"]), "endpoints": {}}
+    for label in before["endpoints"].keys() & after["endpoints"].keys():
+        report["endpoints"][label] = diff(before["endpoints"][label], after["endpoints"][label])
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Mixed-workload load test for the auth and project APIs.
+
+Seeds users, projects, memberships, sessions and audit rows, then drives a
+weighted mix of login, /me, project list/detail and role changes against the
+app and prints one JSON report: throughput and p50/p95/p99 latency per
+endpoint, plus SQL statements per request (counted in-process). The request
+sequence is derived from --seed, so two runs with the same arguments replay
+the same workload and their reports can be diffed with compare_runs.py.
+
+    python benchmarks/load_suite.py --requests 2000 --concurrency 8 --out before.json
+    python benchmarks/load_suite.py --server uvicorn --db-url mysql+mysqlconnector://...
+    python benchmarks/load_suite.py --url http://127.0.0.1:8000 --db-url ...  # already running app
+
+By default a throwaway SQLite database is used; --db-url points it at MariaDB
+instead (the tables are created if missing and seeded rows are appended).
+"""
+import argparse
+import contextvars
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+PASSWORD = "benchmark-password"
+WORKLOAD = {"login": 2, "me": 40, "list_projects": 25, "project_detail": 25, "set_role": 8}
+CHUNK = 5000
+
+_endpoint = contextvars.ContextVar("bench_endpoint", default=None)
+
+def percentile(sorted_values, pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+class StatementCounter:
+    """Counts SQL statements per endpoint label.
+
+    The label travels in an ``x-bench-endpoint`` header and is put into a
+    contextvar by an ASGI wrapper, so statements issued from the request's
+    threadpool worker are attributed to it. Statements without a label come
+    from background workers (write-behind flushes, audit batches, ...).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            label = dict(scope["headers"]).get(b"x-bench-endpoint")
+            token = _endpoint.set(label.decode() if label else None)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _endpoint.reset(token)
+        else:
+            await self.app(scope, receive, send)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.counts[_endpoint.get() or "background"] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+def seed(args, rng):
+    from sqlalchemy import func, insert, select
+    from core.database import SessionLocal
+    from core.models import User, Session, AuthAudit
+    from core.security import hash_password
+    from project.models import Project, ProjectUserRole
+
+    db = SessionLocal()
+    now = datetime.utcnow()
+    # One real bcrypt hash shared by every user keeps seeding fast but logins realistic
+    hashed = hash_password(PASSWORD)
+    tag = f"{int(time.time())}-{rng.randrange(10 ** 6)}"
+    first_user = (db.scalar(select(func.max(User.id))) or 0) + 1
+    first_project = (db.scalar(select(func.max(Project.id))) or 0) + 1
+
+    def bulk(model, rows):
+        for start in range(0, len(rows), CHUNK):
+            db.execute(insert(model), rows[start:start + CHUNK])
+
+    bulk(User, [
+        {"email": f"bench-{tag}-{i}@example.com", "hashed_password": hashed, "full_name": f"Bench User {i}",
+         "role": "user", "is_active": True}
+        for i in range(args.users)
+    ])
+    user_ids = list(range(first_user, first_user + args.users))
+    bulk(Project, [{"name": f"Bench Project {i}", "description": "load suite"} for i in range(args.projects)])
+    project_ids = list(range(first_project, first_project + args.projects))
+
+    memberships = {}
+    rows = []
+    for project_id in project_ids:
+        members = rng.sample(user_ids, min(args.members, len(user_ids)))
+        memberships[project_id] = members
+        rows += [
+            {"project_id": project_id, "user_id": u, "role": "owner" if n == 0 else rng.choice(("developer", "viewer"))}
+            for n, u in enumerate(members)
+        ]
+    bulk(ProjectUserRole, rows)
+
+    # One live session per user for the workload, plus historical ones and their audit trail
+    sessions = {u: f"bench-{tag}-{u}" for u in user_ids}
+    rows = [{"session_id": sid, "user_id": u, "is_active": True, "created_at": now, "last_active_at": now}
+            for u, sid in sessions.items()]
+    history = []
+    for u in user_ids:
+        for n in range(args.sessions_per_user):
+            when = now - timedelta(days=rng.uniform(0, 60))
+            rows.append({"session_id": f"bench-{tag}-{u}-{n}", "user_id": u, "is_active": False,
+                         "created_at": when, "last_active_at": when})
+            history.append((u, f"bench-{tag}-{u}-{n}", when))
+    bulk(Session, rows)
+    rows = [{"user_id": u, "event": "login", "session_id": sid, "timestamp": when, "ip_address": "10.0.0.1"}
+            for u, sid, when in history]
+    rows += [{"user_id": rng.choice(user_ids), "event": "failed_login", "timestamp": now - timedelta(days=rng.uniform(0, 60))}
+             for _ in range(args.failed_logins)]
+    bulk(AuthAudit, rows)
+    db.commit()
+    users = {u: email for u, email in db.execute(select(User.id, User.email).where(User.id.in_(user_ids)))}
+    db.close()
+    return users, sessions, memberships
+
+def build_plan(rng, count, page_size, users, memberships):
+    # (label, method, path, user_id, json body) for every request, in order
+    user_projects = defaultdict(list)
+    for project_id, members in memberships.items():
+        for u in members:
+            user_projects[u].append(project_id)
+    members_of = [u for u in users if user_projects[u]]
+    labels, weights = zip(*WORKLOAD.items())
+    plan = []
+    for label in rng.choices(labels, weights=weights, k=count):
+        if label == "login":
+            u = rng.choice(list(users))
+            plan.append((label, "POST", "/api/auth/login", None, {"email": users[u], "password": PASSWORD}))
+        elif label == "me":
+            plan.append((label, "GET", "/api/auth/me", rng.choice(list(users)), None))
+        elif label == "list_projects":
+            plan.append((label, "GET", f"/api/projects/?limit={page_size}", rng.choice(members_of), None))
+        elif label == "project_detail":
+            u = rng.choice(members_of)
+            plan.append((label, "GET", f"/api/projects/{rng.choice(user_projects[u])}", u, None))
+        else:
+            project_id = rng.choice(list(memberships))
+            owner, *others = memberships[project_id]
+            target = rng.choice(others) if others else owner
+            role = "owner" if target == owner else rng.choice(("developer", "viewer"))
+            plan.append((label, "POST", f"/api/projects/{project_id}/users", owner, {"user_id": target, "role": role}))
+    return plan
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess",
+                        help="drive the app through TestClient, or over HTTP from an in-process uvicorn")
+    parser.add_argument("--url", help="benchmark an already running app instead (no SQL statement counts)")
+    parser.add_argument("--db-url", help="database to seed (and serve from); defaults to a temporary SQLite file")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--members", type=int, default=25)
+    parser.add_argument("--sessions-per-user", type=int, default=5)
+    parser.add_argument("--failed-logins", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.db_url:
+        os.environ["DB_URL"] = args.db_url
+    else:
+        os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    import httpx
+    import sqlalchemy
+    from sqlalchemy import event
+    from core.config import settings
+    from core import database
+    from core.security import create_access_token
+    from core.router import access_token_claims
+    from core.models import User
+
+    rng = random.Random(args.seed)
+    engine = database.init_db()
+    users, sessions, memberships = seed(args, rng)
+    tokens = {
+        u: create_access_token(access_token_claims(User(id=u, email=email, full_name=None, role="user", token_epoch=0), sessions[u]))
+        for u, email in users.items()
+    }
+    plan = build_plan(rng, args.requests, args.page_size, users, memberships)
+
+    counter = None
+    server = thread = None
+    if args.url:
+        client = httpx.Client(base_url=args.url, timeout=60)
+    else:
+        import main as app_module
+        counter = StatementCounter(app_module.app)
+        event.listen(engine, "after_cursor_execute", counter.on_execute)
+        if database.async_engine is not None:
+            event.listen(database.async_engine.sync_engine, "after_cursor_execute", counter.on_execute)
+        if args.server == "uvicorn":
+            import uvicorn
+            port = free_port()
+            server = uvicorn.Server(uvicorn.Config(counter, host="127.0.0.1", port=port, log_level="warning"))
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+            while not server.started:
+                time.sleep(0.05)
+            client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60)
+        else:
+            from fastapi.testclient import TestClient
+            client = TestClient(counter).__enter__()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def send(item, record=True):
+        label, method, path, user_id, body = item
+        headers = {"x-bench-endpoint": label}
+        if user_id is not None:
+            headers["Authorization"] = "Bearer " + tokens[user_id]
+        start = time.perf_counter()
+        response = client.request(method, path, json=body, headers=headers)
+        elapsed = time.perf_counter() - start
+        if record:
+            with lock:
+                latencies[label].append(elapsed)
+                if response.status_code >= 400:
+                    errors[label] += 1
+
+    try:
+        warmup = build_plan(random.Random(args.seed + 1), args.warmup, args.page_size, users, memberships)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda item: send(item, record=False), warmup))
+        if counter is not None:
+            counter.reset()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(send, plan))
+        wall = time.perf_counter() - started
+        statements = dict(counter.counts) if counter is not None else {}
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join()
+        elif not args.url:
+            client.__exit__(None, None, None)
+        else:
+            client.close()
+
+    def summary(values, count_errors, label=None):
+        values = sorted(values)
+        result = {
+            "requests": len(values),
+            "errors": count_errors,
+            "throughput_rps": round(len(values) / wall, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        }
+        if counter is not None and label is not None:
+            result["sql_statements_per_request"] = round(statements.get(label, 0) / len(values), 2) if values else 0.0
+        return result
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "db_url")},
+        "environment": {
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "database": engine.dialect.name,
+            "db_mode": settings.DB_MODE,
+            "auth_stateless": settings.AUTH_STATELESS,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        },
+        "wall_seconds": round(wall, 3),
+        "overall": summary([v for values in latencies.values() for v in values], sum(errors.values())),
+        "endpoints": {label: summary(latencies[label], errors[label], label) for label in WORKLOAD if latencies[label]},
+    }
+    if counter is not None:
+        report["background_sql_statements"] = statements.get("background", 0)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import case, update
+from core.config import settings
+from core.database import SessionLocal
+from core.models import Session
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer for Session.last_active_at: touches are kept in memory
+# (latest timestamp per session wins) and written as one UPDATE per interval
+class SessionActivityBuffer:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.flushes = 0
+        self.rows_written = 0
+        self._pending: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def touch(self, session_id: str, when: datetime) -> None:
+        with self._lock:
+            current = self._pending.get(session_id)
+            if current is None or current < when:
+                self._pending[session_id] = when
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._pending.pop(session_id, None)
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        stmt = (
+            update(Session)
+            .where(Session.session_id.in_(pending.keys()), Session.is_active == True)
+            .values(last_active_at=case(pending, value=Session.session_id))
+            .execution_options(synchronize_session=False)
+        )
+        db = SessionLocal()
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to flush %d session activity updates", len(pending))
+            for session_id, when in pending.items():
+                self.touch(session_id, when)
+            return 0
+        finally:
+            db.close()
+        self.flushes += 1
+        self.rows_written += len(pending)
+        return len(pending)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-activity-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "flushes": self.flushes, "rows_written": self.rows_written}
+
+session_activity = SessionActivityBuffer(interval=settings.SESSION_TOUCH_FLUSH_INTERVAL_SECONDS)
+
+def record_activity(session: Session, now: Optional[datetime] = None) -> None:
+    # Only advance last_active_at once it is more than the allowed staleness behind
+    now = now or datetime.utcnow()
+    last = session.last_active_at
+    if last is None or (now - last).total_seconds() >= settings.SESSION_TOUCH_MAX_STALENESS_SECONDS:
+        session.last_active_at = now
+        session_activity.touch(session.session_id, now)
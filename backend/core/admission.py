@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+from typing import List, Optional, Tuple
+from core.config import settings
+from core.metrics import CounterFamily, registry
+
+logger = logging.getLogger(__name__)
+
+CRITICAL, HIGH, NORMAL, LOW = "critical", "high", "normal", "low"
+
+# Pressure at which each priority is shed; critical routes are never shed
+SHED_THRESHOLDS = {HIGH: 1.0, NORMAL: 0.8, LOW: 0.5}
+
+# (method or None for any, path prefix, priority, uses password hashing, counted as in flight),
+# first match wins. Long-lived streams are admitted like any request but not counted afterwards.
+ROUTE_RULES: List[Tuple[Optional[str], str, str, bool, bool]] = [
+    (None, "/live", CRITICAL, False, False),
+    (None, "/ready", CRITICAL, False, False),
+    (None, "/metrics", CRITICAL, False, False),
+    ("POST", "/api/auth/login", LOW, True, True),
+    ("POST", "/api/auth/register", LOW, True, True),
+    ("POST", "/api/auth/users/import", LOW, True, False),
+    ("GET", "/api/projects/events", HIGH, False, False),
+    ("GET", "/api/auth/me", HIGH, False, True),
+    ("GET", "/", HIGH, False, True),
+    (None, "/", NORMAL, False, True),
+]
+
+requests_shed = registry.register(CounterFamily(
+    "http_requests_shed_total", "Requests rejected with 503 by admission control, by priority.", ("priority",)))
+
+def route_rule(method: str, path: str) -> Tuple[str, bool, bool]:
+    for rule_method, prefix, priority, hashing, tracked in ROUTE_RULES:
+        if (rule_method is None or rule_method == method) and path.startswith(prefix):
+            return priority, hashing, tracked
+    return NORMAL, False, True
+
+# Per-worker load shedding. Pressure is the highest of three ratios, 1.0 meaning
+# "at the configured limit": requests in flight, DB pool saturation (blocked
+# checkouts or a slow recent checkout wait, across the primary pools) and, for
+# routes that hash passwords, the hashing executor's queue depth. A request is
+# rejected with 503 + Retry-After when the pressure reaches its priority's
+# threshold, so login bursts are throttled first and reads last.
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_pool_waiters: int, pool_wait_target: float):
+        self.max_in_flight = max_in_flight
+        self.max_pool_waiters = max_pool_waiters
+        self.pool_wait_target = pool_wait_target
+        self.in_flight = 0
+        self.monitors = []
+        self.hashing_executor = None
+        self._lock = threading.Lock()
+
+    def watch(self, *monitors, hashing_executor=None) -> None:
+        self.monitors = [m for m in monitors if m is not None]
+        self.hashing_executor = hashing_executor
+
+    def signals(self) -> dict:
+        pool = 0.0
+        for monitor in self.monitors:
+            pool = max(pool, monitor.waiting / self.max_pool_waiters, monitor.recent_wait() / self.pool_wait_target)
+        hashing = 0.0
+        if self.hashing_executor is not None:
+            hashing = self.hashing_executor.pending / self.hashing_executor.max_pending
+        return {"in_flight": self.in_flight / self.max_in_flight, "db_pool": pool, "hashing": hashing}
+
+    def pressure(self, hashing: bool = True) -> float:
+        signals = self.signals()
+        if not hashing:
+            signals.pop("hashing")
+        return max(signals.values())
+
+    def admit(self, priority: str, hashing: bool) -> bool:
+        if priority == CRITICAL:
+            return True
+        if self.pressure(hashing) >= SHED_THRESHOLDS[priority]:
+            requests_shed.labels(priority).inc()
+            return False
+        return True
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def collect(self) -> List[str]:
+        # Registry collector: the signals as of the scrape
+        lines = ["# HELP admission_pressure Saturation signals read by admission control (1.0 = at limit).",
+                 "# TYPE admission_pressure gauge"]
+        lines += ['admission_pressure{signal="%s"} %s' % (name, round(value, 4)) for name, value in self.signals().items()]
+        return lines
+
+    def ready(self) -> Tuple[bool, dict]:
+        # Not ready once reads would be close to shedding. A busy hashing executor only
+        # throttles logins, so it does not take the worker out of rotation.
+        signals = self.signals()
+        return max(signals["in_flight"], signals["db_pool"]) < settings.ADMISSION_READY_THRESHOLD, signals
+
+admission = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_pool_waiters=settings.ADMISSION_MAX_POOL_WAITERS,
+    pool_wait_target=settings.ADMISSION_POOL_WAIT_TARGET_MS / 1000,
+)
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying `admission` before routing, so shed
+    requests cost no threadpool slot, DB connection or hash."""
+
+    def __init__(self, app):
+        self.app = app
+        self.body = json.dumps({"detail": "Server busy, please retry"}).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        priority, hashing, tracked = route_rule(scope["method"], scope["path"])
+        if not admission.admit(priority, hashing):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(self.body)).encode()),
+                    (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": self.body})
+            return
+        if not tracked:
+            await self.app(scope, receive, send)
+            return
+        admission.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.leave()
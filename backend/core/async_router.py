@@ -0,0 +1,246 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Path, Query
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.models import User, Session
+from core import database
+from core.database import get_async_db
+from core.replicas import read_replicas, sticky_until
+from sqlalchemy.exc import OperationalError
+from core.security import hash_password_async, verify_and_update_password_async, create_access_token, decode_access_token
+from core.cache import session_cache, evict_session, evict_user_sessions
+from core.activity import session_activity, record_activity
+from core.audit import audit_pipeline
+from core.revocation import revocation_list
+from core.analytics import series_query, series_response, top_query
+from core.responses import UploadStreamingResponse
+from core.user_import import UserImport, existing_emails_async, import_format, insert_users_async, iter_lines, iter_records, ndjson_lines
+from core.router import token_auth_scheme, UserCreate, UserLogin, TokenResponse, _detached_copy, SESSION_FIELDS, sessions_page_query, session_list_response, access_token_claims, stateless_user, SAFE_METHODS, login_analytics_range, session_check, replica_failed
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
+from typing import Optional
+from datetime import datetime
+from uuid import uuid4
+
+# Coroutine versions of the core.router auth routes, mounted instead of them when DB_MODE=async
+async_core_router = APIRouter(prefix="/api/auth", tags=["core"])
+
+async def get_current_user_async(request: Request, credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme), db: AsyncSession = Depends(get_async_db)):
+    token = credentials.credentials
+    try:
+        payload = decode_access_token(token)
+        user_id = int(payload.get("sub"))
+        session_id = payload.get("session_id")
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if request.method not in SAFE_METHODS:
+        read_replicas.mark_write(user_id, request)
+    user = stateless_user(payload, user_id, session_id)
+    if user is not None:
+        return user
+    cached = session_cache.get((user_id, session_id))
+    if cached is not None:
+        record_activity(cached[1])
+        return cached[0]
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if payload.get("epoch", 0) < (user.token_epoch or 0):
+        raise HTTPException(status_code=401, detail="Session invalid or expired")
+    result = await db.execute(select(Session).filter_by(session_id=session_id, user_id=user_id, is_active=True))
+    session = result.scalars().first()
+    if not session:
+        raise HTTPException(status_code=401, detail="Session invalid or expired")
+    user_snapshot = _detached_copy(user)
+    session_snapshot = _detached_copy(session)
+    record_activity(session_snapshot)
+    session_cache.set((user_id, session_id), (user_snapshot, session_snapshot))
+    return user_snapshot
+
+async def session_still_valid_async(token: str) -> bool:
+    # Async counterpart of core.router.session_still_valid
+    check = session_check(token)
+    if isinstance(check, bool):
+        return check
+    async with database.AsyncSessionLocal() as db:
+        return (await db.execute(check)).first() is not None
+
+async def get_read_async_db(request: Request, current_user: User = Depends(get_current_user_async)):
+    # Async counterpart of core.router.get_read_db
+    replica = read_replicas.choose(current_user.id, sticky_until(request))
+    db = await replica.async_session() if replica is not None else None
+    if db is None:
+        replica, db = None, database.AsyncSessionLocal()
+    async with db:
+        try:
+            yield db
+        except OperationalError as e:
+            if replica is not None:
+                raise replica_failed(replica, e)
+            raise
+
+@async_core_router.post("/register", response_model=dict, tags=["core"])
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User.id).where(User.email == user.email))
+    if result.first():
+        raise HTTPException(status_code=400, detail="Email already registered")
+    db_user = User(
+        email=user.email,
+        hashed_password=await hash_password_async(user.password),
+        full_name=user.full_name,
+        is_active=True,
+        role="user"
+    )
+    db.add(db_user)
+    await db.commit()
+    return {"msg": "User registered successfully"}
+
+@async_core_router.post("/login", response_model=TokenResponse, tags=["core"])
+async def login(user: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.email == user.email))
+    db_user = result.scalars().first()
+    ip = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent")
+    valid, new_hash = await verify_and_update_password_async(user.password, db_user.hashed_password) if db_user else (False, None)
+    if not valid:
+        audit_pipeline.record("failed_login", user_id=db_user.id if db_user else None, ip_address=ip, user_agent=user_agent)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if not db_user.is_active:
+        audit_pipeline.record("failed_login", user_id=db_user.id, ip_address=ip, user_agent=user_agent)
+        raise HTTPException(status_code=400, detail="Inactive user")
+    session_id = str(uuid4())
+    db.add(Session(
+        session_id=session_id,
+        user_id=db_user.id,
+        ip_address=ip,
+        user_agent=user_agent,
+        is_active=True
+    ))
+    if new_hash:
+        db_user.hashed_password = new_hash
+    await db.commit()
+    audit_pipeline.record("login", user_id=db_user.id, ip_address=ip, user_agent=user_agent, session_id=session_id)
+    token = create_access_token(access_token_claims(db_user, session_id))
+    return TokenResponse(access_token=token)
+
+@async_core_router.post("/logout", response_model=dict, tags=["core"])
+async def logout(current_user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db), credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme)):
+    session_id = decode_access_token(credentials.credentials).get("session_id")
+    now = datetime.utcnow()
+    await db.execute(
+        update(Session)
+        .where(Session.session_id == session_id, Session.user_id == current_user.id, Session.is_active == True)
+        .values(is_active=False, last_active_at=now, revoked_at=now)
+    )
+    await db.commit()
+    revocation_list.add(session_id, now)
+    evict_session(current_user.id, session_id)
+    session_activity.discard(session_id)
+    audit_pipeline.record_logout(session_id)
+    return {"msg": "Logged out"}
+
+@async_core_router.get("/me", response_model=dict, tags=["core"])
+async def me(current_user: User = Depends(get_current_user_async)):
+    return {
+        "id": current_user.id,
+        "email": current_user.email,
+        "full_name": current_user.full_name,
+        "role": current_user.role,
+        "is_active": current_user.is_active
+    }
+
+@async_core_router.get("/sessions", response_model=list, tags=["core"])
+async def list_sessions(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_async_db),
+    user_id: int = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(SESSION_FIELDS)),
+):
+    if user_id is not None:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+    else:
+        user_id = current_user.id
+    selected = parse_fields(fields, SESSION_FIELDS)
+    result = await db.scalars(sessions_page_query(user_id, limit, cursor, selected))
+    return session_list_response(result.all(), limit, selected)
+
+@async_core_router.post("/sessions/{session_id}/revoke", response_model=dict, tags=["core"])
+async def revoke_session(session_id: str = Path(...), current_user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(Session).filter_by(session_id=session_id))
+    session = result.scalars().first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    now = datetime.utcnow()
+    session.is_active = False
+    session.last_active_at = now
+    session.revoked_at = now
+    await db.commit()
+    revocation_list.add(session_id, now)
+    evict_session(session.user_id, session_id)
+    session_activity.discard(session_id)
+    return {"msg": "Session revoked"}
+
+@async_core_router.post("/users/{user_id}/deactivate", response_model=dict, tags=["core"])
+async def deactivate_user(user_id: int = Path(...), current_user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    now = datetime.utcnow()
+    user.is_active = False
+    user.token_epoch = (user.token_epoch or 0) + 1
+    await db.execute(
+        update(Session)
+        .where(Session.user_id == user_id, Session.is_active == True)
+        .values(is_active=False, last_active_at=now, revoked_at=now)
+    )
+    await db.commit()
+    revocation_list.set_epoch(user_id, user.token_epoch)
+    evict_user_sessions(user_id)
+    return {"msg": "User deactivated"}
+
+@async_core_router.post("/users/import", tags=["core"])
+async def import_users(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; defaults to the Content-Type"),
+    current_user: User = Depends(get_current_user_async),
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    fmt = import_format(request.headers.get("content-type"), format)
+    job = UserImport(
+        existing=lambda emails: existing_emails_async(database.AsyncSessionLocal, emails),
+        insert=lambda rows: insert_users_async(database.AsyncSessionLocal, rows),
+    )
+    results = job.run(iter_records(iter_lines(request.stream()), fmt))
+    return UploadStreamingResponse(ndjson_lines(results), media_type="application/x-ndjson")
+
+@async_core_router.get("/analytics/logins", response_model=dict, tags=["core"])
+async def login_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    ip_address: Optional[str] = None,
+    top: int = Query(0, ge=0, le=100, description="Also return the users and IPs with the most failed logins"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_async_db),
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    start, end, dimension, subject = login_analytics_range(start, end, user_id, ip_address)
+    rows = (await db.execute(series_query(dimension, subject, start, end))).all()
+    leaders = None
+    if top and dimension == "all":
+        leaders = {f"top_{d}s": (await db.execute(top_query(d, start, end, top))).all() for d in ("user", "ip")}
+    return series_response(start, end, dimension, subject, rows, leaders)
+
+@async_core_router.get("/session-cache", response_model=dict, tags=["core"])
+async def session_cache_stats(current_user: User = Depends(get_current_user_async)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {**session_cache.stats(), "revocation": revocation_list.stats()}
@@ -0,0 +1,177 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert, update
+from core.config import settings
+from core.analytics import rollup_increment_statement
+from core.database import SessionLocal
+from core.models import AuthAudit
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Bounded in-memory queue of auth audit events, bulk-inserted by a background
+# worker. When the queue is full new events are dropped and counted; a batch the
+# database keeps rejecting is retried with backoff, then discarded and counted.
+class AuditPipeline:
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float,
+                 write_retries: int = 3, retry_backoff: float = 0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+        self.enqueued = 0
+        self.dropped = 0
+        self.failed = 0
+        self.written = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+
+    def _put(self, item: dict) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("Auth audit queue full, %d events dropped so far", self.dropped)
+            return False
+        self.enqueued += 1
+        return True
+
+    def record(self, event: str, user_id: Optional[int] = None, ip_address: Optional[str] = None,
+               user_agent: Optional[str] = None, session_id: Optional[str] = None) -> bool:
+        return self._put({
+            "op": "insert",
+            "user_id": user_id,
+            "event": event,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "session_id": session_id,
+            "timestamp": datetime.utcnow(),
+        })
+
+    def record_logout(self, session_id: str) -> bool:
+        # Sets logout_timestamp on the login audit row of the same session
+        return self._put({"op": "logout", "session_id": session_id, "logout_timestamp": datetime.utcnow()})
+
+    def _collect(self, first) -> List:
+        # Gather up to batch_size events, waiting at most flush_interval after the first one
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[dict]) -> None:
+        rows = []
+        pending_logins = {}
+        logouts = {}
+        for item in batch:
+            if item["op"] == "insert":
+                row = {k: v for k, v in item.items() if k != "op"}
+                rows.append(row)
+                if row["event"] == "login" and row["session_id"]:
+                    pending_logins[row["session_id"]] = row
+            elif item["session_id"] in pending_logins:
+                pending_logins[item["session_id"]]["logout_timestamp"] = item["logout_timestamp"]
+            else:
+                logouts[item["session_id"]] = item["logout_timestamp"]
+        for row in rows:
+            row.setdefault("logout_timestamp", None)
+        for attempt in range(self.write_retries + 1):
+            try:
+                self._insert(rows, logouts)
+            except Exception:
+                if attempt == self.write_retries:
+                    self.failed += len(batch)
+                    logger.exception("Discarding %d auth audit events after %d attempts (%d discarded so far)",
+                                     len(batch), attempt + 1, self.failed)
+                    return
+                delay = min(self.retry_backoff * 2 ** attempt, 10.0)
+                logger.warning("Failed to write %d auth audit events, retrying in %.2fs", len(batch), delay, exc_info=True)
+                time.sleep(delay)
+            else:
+                self.written += len(rows)
+                return
+
+    def _insert(self, rows: List[dict], logouts: dict) -> None:
+        # One transaction per attempt, on a fresh session
+        db = SessionLocal()
+        try:
+            if rows:
+                db.execute(insert(AuthAudit), rows)
+                # Login rollups are kept in step with the audit rows, in the same transaction
+                rollup = rollup_increment_statement(db.get_bind().dialect.name, rows)
+                if rollup is not None:
+                    db.execute(rollup)
+            for session_id, logout_timestamp in logouts.items():
+                db.execute(
+                    update(AuthAudit)
+                    .where(AuthAudit.session_id == session_id, AuthAudit.event == "login")
+                    .values(logout_timestamp=logout_timestamp)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect(self._queue.get())
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stop:
+                break
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="auth-audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        # Blocking put so the sentinel is queued behind everything still pending
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "written": self.written,
+        }
+
+    def collect(self) -> List[str]:
+        # Registry collector: what became of the events enqueued so far
+        lines = ["# HELP auth_audit_events_total Auth audit events by outcome (dropped: queue full, failed: write gave up).",
+                 "# TYPE auth_audit_events_total counter"]
+        for outcome, value in (("written", self.written), ("dropped", self.dropped), ("failed", self.failed)):
+            lines.append('auth_audit_events_total{outcome="%s"} %d' % (outcome, value))
+        lines += ["# TYPE auth_audit_queue_depth gauge", "auth_audit_queue_depth %d" % self._queue.qsize()]
+        return lines
+
+audit_pipeline = AuditPipeline(
+    maxsize=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    write_retries=settings.AUDIT_WRITE_RETRIES,
+    retry_backoff=settings.AUDIT_RETRY_BACKOFF_SECONDS,
+)
@@ -0,0 +1,52 @@
+"""Database management commands. The app no longer creates or alters tables itself.
+
+    python -m core.cli create    # empty database -> all tables at the latest version
+    python -m core.cli migrate   # apply pending migrations (also versions pre-existing databases)
+    python -m core.cli version   # show the database and build schema versions
+    python -m core.cli backfill-rollups [--since ISO] [--until ISO] [--chunk-hours N]
+                                 # rebuild login rollups of completed hours from auth_audit
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from core.analytics import backfill
+from core.database import SessionLocal, init_engines, init_db
+from core.migrations import current_version, migrate, schema_head
+
+def cmd_create(args) -> int:
+    init_db()
+    print(f"Schema created at version {schema_head()}")
+    return 0
+
+def cmd_migrate(args) -> int:
+    applied = migrate(init_engines())
+    print(f"Applied migrations: {', '.join(map(str, applied))}" if applied else "Schema already up to date")
+    return 0
+
+def cmd_version(args) -> int:
+    with init_engines().connect() as conn:
+        version = current_version(conn)
+    print(f"database: {version if version is not None else 'unversioned'}, build: {schema_head()}")
+    return 0 if version is not None and version >= schema_head() else 1
+
+def cmd_backfill_rollups(args) -> int:
+    init_engines()
+    events = backfill(SessionLocal, since=args.since, until=args.until, chunk_hours=args.chunk_hours)
+    print(f"Rolled up {events} audit events")
+    return 0
+
+COMMANDS = {"create": cmd_create, "migrate": cmd_migrate, "version": cmd_version, "backfill-rollups": cmd_backfill_rollups}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.cli", description="Database management commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--since", type=datetime.fromisoformat, help="backfill-rollups: first hour (default: oldest audit row)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="backfill-rollups: end hour, exclusive (default: current hour)")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="backfill-rollups: hours per transaction")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    sys.exit(main())
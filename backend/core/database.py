@@ -1,12 +1,84 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from core.config import settings
+from core.pool import PoolMonitor, engine_options
+from core.instrumentation import instrument_engine
+from core.replicas import read_replicas
 from core.models import Base, User
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
-engine = create_engine(settings.DB_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines are built by init_engines() (called from the app lifespan, the CLI and
+# scripts), so importing the app neither loads DB drivers nor touches the network.
+# SessionLocal/AsyncSessionLocal are bound to them at that point.
+pool_monitor = PoolMonitor("primary")
+engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Async drivers used when ASYNC_DB_URL is not given explicitly
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mariadb": "mariadb+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+async_engine = None
+async_pool_monitor = PoolMonitor("async") if settings.DB_MODE == "async" else None
+AsyncSessionLocal = None
+
+def init_engines():
+    # Idempotent; returns the sync engine, which background workers use in both modes
+    global engine, async_engine, AsyncSessionLocal
+    if engine is not None:
+        return engine
+    engine = create_engine(settings.DB_URL, **engine_options(settings.DB_URL, pool_monitor))
+    pool_monitor.attach(engine)
+    instrument_engine(engine)
+    SessionLocal.configure(bind=engine)
+    if settings.DB_MODE == "async":
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        async_url = settings.ASYNC_DB_URL or get_async_url(settings.DB_URL)
+        async_engine = create_async_engine(async_url, **engine_options(async_url, async_pool_monitor))
+        async_pool_monitor.attach(async_engine.sync_engine)
+        instrument_engine(async_engine.sync_engine)
+        # expire_on_commit=False: attributes must not lazy-load after commit in async code
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    read_replicas.connect(get_async_url if settings.DB_MODE == "async" else None)
+    return engine
+
+async def dispose_engines():
+    global engine, async_engine
+    await read_replicas.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    if engine is not None:
+        engine.dispose()
+        engine = None
+
+def upsert_statement(dialect_name: str, table, rows: List[dict], index_elements: Sequence[str], update_columns: Sequence[str] = (), increment_columns: Sequence[str] = ()):
+    # INSERT ... ON DUPLICATE KEY UPDATE (MySQL/MariaDB) or ON CONFLICT DO UPDATE (SQLite).
+    # update_columns take the new row's value, increment_columns are added to the stored one.
+    if dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        new = stmt.inserted
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        new = stmt.excluded
+    else:
+        raise NotImplementedError(f"Upsert is not supported for {dialect_name}")
+    values = {c: new[c] for c in update_columns}
+    values.update({c: table.c[c] + new[c] for c in increment_columns})
+    if dialect_name == "sqlite":
+        return stmt.on_conflict_do_update(index_elements=list(index_elements), set_=values)
+    return stmt.on_duplicate_key_update(values)
 
 def get_db():
     db = SessionLocal()
@@ -15,6 +87,12 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
-    # Ensure all tables, including AuthAudit, are created
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    # Creates all tables and stamps the current schema version (what `python -m core.cli create` runs)
+    from core.migrations import create_schema
+    create_schema(init_engines())
+    return engine
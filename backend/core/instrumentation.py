@@ -0,0 +1,136 @@
+import contextvars
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy import event
+from core.admission import route_rule
+from core.config import settings
+from core.metrics import CounterFamily, GaugeFamily, HistogramFamily, histogram_lines, registry
+
+logger = logging.getLogger(__name__)
+
+# Statements per request are small integers
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+http_requests = registry.register(CounterFamily(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")))
+http_duration = registry.register(HistogramFamily(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")))
+http_in_flight = registry.register(GaugeFamily(
+    "http_requests_in_flight", "HTTP requests currently being served."))
+request_statements = registry.register(HistogramFamily(
+    "http_request_db_statements", "SQL statements issued while serving one request.", ("method", "route"), STATEMENT_BUCKETS))
+request_db_time = registry.register(HistogramFamily(
+    "http_request_db_seconds", "Time spent in SQL statements while serving one request.", ("method", "route")))
+db_statements = registry.register(CounterFamily(
+    "db_statements_total", "SQL statements executed, by origin (request or background worker).", ("origin",)))
+db_time = registry.register(CounterFamily(
+    "db_statement_seconds_total", "Time spent executing SQL statements, by origin.", ("origin",)))
+hash_duration = registry.register(HistogramFamily(
+    "password_hash_duration_seconds", "bcrypt operation latency including executor queueing.", ("operation",)))
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "hash_time", "queries")
+
+    def __init__(self, capture: bool):
+        self.statements = 0
+        self.db_time = 0.0
+        self.hash_time = 0.0
+        self.queries: Optional[List[tuple]] = [] if capture else None
+
+# Set for the duration of a request; threadpool workers and async greenlets
+# inherit it, so SQL issued on behalf of the request is attributed to it
+_request_stats: contextvars.ContextVar = contextvars.ContextVar("request_stats", default=None)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = _request_stats.get()
+    origin = "request" if stats is not None else "background"
+    db_statements.labels(origin).inc()
+    db_time.labels(origin).inc(elapsed)
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        if stats.queries is not None and len(stats.queries) < settings.SLOW_REQUEST_MAX_STATEMENTS:
+            stats.queries.append((elapsed, statement))
+
+def instrument_engine(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+def observe_hashing(operation: str, elapsed: float) -> None:
+    hash_duration.labels(operation).observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.hash_time += elapsed
+
+def pool_collector(*monitors):
+    # Exposes core.pool.PoolMonitor state next to the request metrics
+    def collect() -> List[str]:
+        lines = ["# TYPE db_pool_connections gauge"]
+        statuses = [(m.name, m.status()) for m in monitors if m is not None]
+        for name, status in statuses:
+            for state in ("checked_out", "idle", "overflow"):
+                if state in status:
+                    lines.append('db_pool_connections{pool="%s",state="%s"} %d' % (name, state, status[state]))
+        lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+        for name, status in statuses:
+            lines += histogram_lines("db_pool_checkout_wait_seconds", ("pool",), (name,), status["checkout_wait_seconds"])
+        return lines
+    return collect
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency, status codes, in-flight
+    requests and the SQL/bcrypt work done by each request.
+
+    Requests slower than SLOW_REQUEST_THRESHOLD_MS (0 disables) are logged with
+    the SQL they issued.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.slow_threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats(capture=self.slow_threshold > 0)
+        token = _request_stats.set(stats)
+        # Same exemptions as admission control (long-lived streams, probes), so both in-flight figures agree
+        tracked = route_rule(scope["method"], scope["path"])[2]
+        if tracked:
+            http_in_flight.labels().inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            if tracked:
+                http_in_flight.labels().dec()
+            _request_stats.reset(token)
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_requests.labels(method, route, status_code).inc()
+            http_duration.labels(method, route).observe(elapsed)
+            request_statements.labels(method, route).observe(stats.statements)
+            request_db_time.labels(method, route).observe(stats.db_time)
+            if self.slow_threshold and elapsed >= self.slow_threshold:
+                logger.warning(
+                    "Slow request %s %s -> %d in %.1f ms (%d SQL statements, %.1f ms DB, %.1f ms hashing)%s",
+                    method, scope["path"], status_code, elapsed * 1000, stats.statements,
+                    stats.db_time * 1000, stats.hash_time * 1000,
+                    "".join("\n  [%.1f ms] %s" % (t * 1000, " ".join(sql.split())) for t, sql in stats.queries),
+                )
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, insert, select, update
+from core.config import settings
+from core.database import SessionLocal
+from core.models import AuthAudit, AuthAuditArchive, Session
+from core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = ("id", "user_id", "event", "ip_address", "user_agent", "session_id", "timestamp", "logout_timestamp")
+
+# Periodic retention job. Every step works in chunks of at most chunk_size rows,
+# each in its own short transaction, so no run holds locks on a large range.
+class MaintenanceSweeper:
+    def __init__(self, interval: float, chunk_size: int, session_retention: timedelta, audit_retention: timedelta):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.session_retention = session_retention
+        self.audit_retention = audit_retention
+        self.runs = 0
+        self.expired = 0
+        self.purged = 0
+        self.archived = 0
+        self.last_run_seconds: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _chunked(self, select_ids, apply) -> int:
+        # Repeatedly picks up to chunk_size primary keys and applies a statement to them
+        total = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                ids = db.scalars(select_ids.limit(self.chunk_size)).all()
+                if ids:
+                    apply(db, ids)
+                    db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            total += len(ids)
+            if len(ids) < self.chunk_size:
+                break
+        return total
+
+    def expire_sessions(self, now: datetime) -> int:
+        # Sessions whose token can no longer be valid; revoked_at stays unset since
+        # there is nothing left for core.revocation to reject
+        cutoff = now - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        return self._chunked(
+            select(Session.id).where(Session.is_active == True, Session.created_at < cutoff).order_by(Session.id),
+            lambda db, ids: db.execute(
+                update(Session).where(Session.id.in_(ids)).values(is_active=False).execution_options(synchronize_session=False)
+            ),
+        )
+
+    def purge_sessions(self, now: datetime) -> int:
+        cutoff = now - self.session_retention
+        return self._chunked(
+            select(Session.id).where(Session.is_active == False, Session.last_active_at < cutoff).order_by(Session.id),
+            lambda db, ids: db.execute(delete(Session).where(Session.id.in_(ids)).execution_options(synchronize_session=False)),
+        )
+
+    def archive_audit(self, now: datetime) -> int:
+        cutoff = now - self.audit_retention
+        columns = [getattr(AuthAudit, c) for c in AUDIT_COLUMNS]
+
+        def move(db, ids):
+            db.execute(insert(AuthAuditArchive).from_select(AUDIT_COLUMNS, select(*columns).where(AuthAudit.id.in_(ids))))
+            db.execute(delete(AuthAudit).where(AuthAudit.id.in_(ids)).execution_options(synchronize_session=False))
+
+        return self._chunked(select(AuthAudit.id).where(AuthAudit.timestamp < cutoff).order_by(AuthAudit.id), move)
+
+    def run_once(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        result = {
+            "expired": self.expire_sessions(now),
+            "purged": self.purge_sessions(now),
+            "archived": self.archive_audit(now),
+        }
+        self.expired += result["expired"]
+        self.purged += result["purged"]
+        self.archived += result["archived"]
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+        return result
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Maintenance run failed")
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "expired_sessions": self.expired,
+            "purged_sessions": self.purged,
+            "archived_audit_rows": self.archived,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+maintenance = MaintenanceSweeper(
+    interval=settings.MAINTENANCE_INTERVAL_SECONDS,
+    chunk_size=settings.MAINTENANCE_CHUNK_SIZE,
+    session_retention=timedelta(days=settings.SESSION_RETENTION_DAYS),
+    audit_retention=timedelta(days=settings.AUDIT_RETENTION_DAYS),
+)
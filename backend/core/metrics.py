@@ -0,0 +1,133 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = count
+        return {"count": count, "sum": total, "buckets": buckets}
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = ['%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def histogram_lines(name: str, names: Sequence[str], values: Sequence[str], snapshot: dict) -> List[str]:
+    lines = ["%s_bucket%s %d" % (name, _label_text(names, values, 'le="%s"' % bound), count)
+             for bound, count in snapshot["buckets"].items()]
+    lines.append("%s_sum%s %r" % (name, _label_text(names, values), float(snapshot["sum"])))
+    lines.append("%s_count%s %d" % (name, _label_text(names, values), snapshot["count"]))
+    return lines
+
+class Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+# Labeled metric families rendered in the Prometheus text exposition format
+class MetricFamily:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        return Value()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _child_lines(self, values: tuple, child) -> List[str]:
+        return ["%s%s %r" % (self.name, _label_text(self.labelnames, values), float(child.value))]
+
+    def render(self) -> List[str]:
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s %s" % (self.name, self.kind)]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            lines += self._child_lines(values, child)
+        return lines
+
+class CounterFamily(MetricFamily):
+    kind = "counter"
+
+class GaugeFamily(MetricFamily):
+    kind = "gauge"
+
+class HistogramFamily(MetricFamily):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def _child_lines(self, values: tuple, child) -> List[str]:
+        return histogram_lines(self.name, self.labelnames, values, child.snapshot())
+
+class Registry:
+    def __init__(self):
+        self._families: List[MetricFamily] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        self._families.append(family)
+        return family
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        # collector() returns ready-made exposition lines (HELP/TYPE included)
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self._families:
+            lines += family.render()
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
@@ -0,0 +1,112 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from core.models import Base, AuthAudit, AuthAuditArchive, LoginRollup, SchemaVersion, Session, User
+from project.models import Project
+
+logger = logging.getLogger(__name__)
+
+# Ordered schema changes applied by `python -m core.cli migrate`. Version 1 is the
+# schema that create_all produced before versioning existed. Steps inspect the
+# database first, so they are safe on tables that create_all already brought up
+# to date. The app itself never runs them; at startup it only compares versions.
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def add_column(conn, column) -> None:
+    if column.key not in {c["name"] for c in inspect(conn).get_columns(column.table.name)}:
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+
+def add_index(conn, table, name: str) -> None:
+    if name not in {i["name"] for i in inspect(conn).get_indexes(table.name)}:
+        next(i for i in table.indexes if i.name == name).create(conn)
+
+@migration(2, "auth_audit.session_id")
+def _audit_session_id(conn):
+    add_column(conn, AuthAudit.__table__.c.session_id)
+    add_index(conn, AuthAudit.__table__, "ix_auth_audit_session_id")
+
+@migration(3, "users.token_epoch, sessions.revoked_at")
+def _stateless_tokens(conn):
+    add_column(conn, User.__table__.c.token_epoch)
+    add_column(conn, Session.__table__.c.revoked_at)
+    add_index(conn, Session.__table__, "ix_sessions_revoked_at")
+
+@migration(4, "auth_audit_archive and retention indexes")
+def _retention(conn):
+    AuthAuditArchive.__table__.create(conn, checkfirst=True)
+    add_index(conn, Session.__table__, "ix_sessions_user_id_is_active")
+    add_index(conn, AuthAudit.__table__, "ix_auth_audit_user_id_event_timestamp")
+
+@migration(5, "projects.version, projects.members_version")
+def _project_versions(conn):
+    add_column(conn, Project.__table__.c.version)
+    add_column(conn, Project.__table__.c.members_version)
+
+@migration(6, "login_rollups, auth_audit.timestamp index")
+def _login_rollups(conn):
+    LoginRollup.__table__.create(conn, checkfirst=True)
+    add_index(conn, AuthAudit.__table__, "ix_auth_audit_timestamp")
+
+def schema_head() -> int:
+    return max(version for version, _, _ in MIGRATIONS)
+
+def current_version(conn) -> Optional[int]:
+    # The single query run at startup; None when the database is not versioned yet
+    try:
+        return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+    except Exception:
+        conn.rollback()
+        return None
+
+def _stamp(conn, version: int, description: str) -> None:
+    conn.execute(SchemaVersion.__table__.insert().values(version=version, description=description))
+
+def check_schema(engine) -> int:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    head = schema_head()
+    if version is None or version < head:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this build needs {head}; "
+            "run `python -m core.cli migrate` (or `create` on an empty database)"
+        )
+    if version > head:
+        logger.warning("Database schema version %d is newer than this build (%d)", version, head)
+    return version
+
+def create_schema(engine) -> int:
+    # Creates every table at the latest version; existing tables are left alone
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        if current_version(conn) is None:
+            _stamp(conn, schema_head(), "initial schema")
+    return schema_head()
+
+def migrate(engine) -> List[int]:
+    inspector = inspect(engine)
+    if not inspector.has_table(User.__tablename__):
+        create_schema(engine)
+        return [schema_head()]
+    if not inspector.has_table(SchemaVersion.__tablename__):
+        # Database created by create_all before versioning existed
+        with engine.begin() as conn:
+            SchemaVersion.__table__.create(conn)
+            _stamp(conn, 1, "baseline")
+    applied = []
+    for version, description, step in sorted(MIGRATIONS):
+        with engine.begin() as conn:
+            if version <= (current_version(conn) or 0):
+                continue
+            step(conn)
+            _stamp(conn, version, description)
+        logger.info("Applied schema migration %d: %s", version, description)
+        applied.append(version)
+    return applied
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.orm import declarative_base, relationship
 import datetime
 
@@ -12,6 +12,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     full_name = Column(String(255), nullable=True)
     role = Column(String(50), default="user")  # e.g., "admin", "user"
+    token_epoch = Column(Integer, default=0, server_default="0", nullable=False)  # bumped to invalidate all issued tokens
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     project_roles = relationship("ProjectUserRole", back_populates="user", cascade="all, delete-orphan")
 
@@ -22,8 +23,32 @@ class AuthAudit(Base):
     event = Column(String(50), nullable=False)  # e.g., 'login', 'logout', 'failed_login'
     ip_address = Column(String(50), nullable=True)
     user_agent = Column(String(255), nullable=True)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    session_id = Column(String(255), index=True, nullable=True)  # links login/logout of one session
+    timestamp = Column(DateTime, index=True, default=datetime.datetime.utcnow)
     logout_timestamp = Column(DateTime, nullable=True)
+    __table_args__ = (Index("ix_auth_audit_user_id_event_timestamp", "user_id", "event", "timestamp"),)
+
+class AuthAuditArchive(Base):
+    # Same shape as auth_audit; rows are moved here by core.maintenance once past retention
+    __tablename__ = "auth_audit_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, index=True, nullable=True)
+    event = Column(String(50), nullable=False)
+    ip_address = Column(String(50), nullable=True)
+    user_agent = Column(String(255), nullable=True)
+    session_id = Column(String(255), nullable=True)
+    timestamp = Column(DateTime, index=True)
+    logout_timestamp = Column(DateTime, nullable=True)
+
+class LoginRollup(Base):
+    # Hourly login counters incremented by core.audit and rebuilt by `python -m core.cli backfill-rollups`
+    __tablename__ = "login_rollups"
+    dimension = Column(String(10), primary_key=True)  # 'all', 'user' or 'ip'
+    subject = Column(String(50), primary_key=True)  # '' for 'all', else the user id or IP address
+    bucket = Column(DateTime, primary_key=True)  # start of the hour (UTC)
+    logins = Column(Integer, nullable=False, default=0)
+    failed_logins = Column(Integer, nullable=False, default=0)
+    __table_args__ = (Index("ix_login_rollups_bucket", "bucket"),)
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -34,4 +59,13 @@ class Session(Base):
     last_active_at = Column(DateTime, default=datetime.datetime.utcnow)
     ip_address = Column(String(50), nullable=True)
     user_agent = Column(String(255), nullable=True)
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+    revoked_at = Column(DateTime, index=True, nullable=True)  # set on logout/revocation, feeds core.revocation
+    __table_args__ = (Index("ix_sessions_user_id_is_active", "user_id", "is_active"),)
+
+class SchemaVersion(Base):
+    # One row per applied migration, see core.migrations
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, default=datetime.datetime.utcnow)
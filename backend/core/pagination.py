@@ -0,0 +1,39 @@
+import base64
+import json
+from typing import Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Keyset cursors are the sort key values of the last row of a page, JSON
+# encoded and base64'd so clients treat them as opaque.
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(isinstance(v, t) for v, t in zip(values, types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+def split_page(rows: List, limit: int):
+    # Callers fetch limit + 1 rows; the extra row only signals that another page exists
+    if len(rows) > limit:
+        return rows[:limit], True
+    return rows, False
@@ -0,0 +1,106 @@
+import math
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from core.config import settings
+from core.metrics import Histogram
+
+# Connection lifetimes span seconds to hours
+LIFETIME_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 7200, 14400, 28800)
+
+# Recent checkout wait read by core.admission: moving average over checkouts
+# that fades with this time constant once checkouts stop
+RECENT_WAIT_ALPHA = 0.2
+RECENT_WAIT_SECONDS = 5.0
+
+class PoolMonitor:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkout_wait = Histogram()
+        self.connection_lifetime = Histogram(LIFETIME_BUCKETS)
+        self.checkout_errors = 0
+        # Checkouts currently blocked waiting for a connection
+        self.waiting = 0
+        self._recent_wait = 0.0
+        self._recent_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def begin_wait(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def end_wait(self, elapsed: float) -> None:
+        self.checkout_wait.observe(elapsed)
+        with self._lock:
+            self.waiting -= 1
+            self._recent_wait = self.recent_wait() * (1 - RECENT_WAIT_ALPHA) + elapsed * RECENT_WAIT_ALPHA
+            self._recent_at = time.monotonic()
+
+    def recent_wait(self) -> float:
+        return self._recent_wait * math.exp(-(time.monotonic() - self._recent_at) / RECENT_WAIT_SECONDS)
+
+    def attach(self, engine) -> None:
+        self.pool = engine.pool
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        connection_record.info["connected_at"] = time.monotonic()
+
+    def _on_close(self, dbapi_connection, connection_record) -> None:
+        connected_at = connection_record.info.pop("connected_at", None)
+        if connected_at is not None:
+            self.connection_lifetime.observe(time.monotonic() - connected_at)
+
+    def status(self) -> dict:
+        pool = self.pool
+        result = {"pool_class": type(pool).__name__ if pool is not None else None}
+        if isinstance(pool, QueuePool):
+            result.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                timeout=pool.timeout(),
+            )
+        result["checkout_errors"] = self.checkout_errors
+        result["waiting"] = self.waiting
+        result["recent_wait_seconds"] = round(self.recent_wait(), 4)
+        result["checkout_wait_seconds"] = self.checkout_wait.snapshot()
+        result["connection_lifetime_seconds"] = self.connection_lifetime.snapshot()
+        return result
+
+def instrumented_pool_class(base, monitor: PoolMonitor):
+    # Subclass of the dialect's pool that times how long checkouts wait for a
+    # connection. Kept as a class attribute so Pool.recreate() preserves it.
+    def _do_get(self):
+        start = time.perf_counter()
+        monitor.begin_wait()
+        try:
+            return base._do_get(self)
+        except Exception:
+            monitor.checkout_errors += 1
+            raise
+        finally:
+            monitor.end_wait(time.perf_counter() - start)
+
+    return type("Instrumented" + base.__name__, (base,), {"_do_get": _do_get, "monitor": monitor})
+
+def engine_options(url: str, monitor: PoolMonitor) -> dict:
+    parsed = make_url(url)
+    base = parsed.get_dialect().get_pool_class(parsed)
+    options = {
+        "poolclass": instrumented_pool_class(base, monitor),
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if issubclass(base, QueuePool):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
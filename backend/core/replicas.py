@@ -0,0 +1,205 @@
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from core.cache import TTLCache
+from core.config import settings
+from core.instrumentation import instrument_engine
+from core.pool import PoolMonitor, engine_options
+
+logger = logging.getLogger(__name__)
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.monitor = PoolMonitor(name)
+        self.engine = None
+        self.async_engine = None
+        self.sessionmaker = None
+        self.async_sessionmaker = None
+        self.healthy = True
+        self.last_error: Optional[str] = None
+
+    def connect(self, async_url: Optional[str] = None) -> None:
+        self.engine = create_engine(self.url, **engine_options(self.url, self.monitor))
+        self.monitor.attach(self.engine)
+        instrument_engine(self.engine)
+        self.sessionmaker = sessionmaker(bind=self.engine, autocommit=False, autoflush=False)
+        if async_url is not None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+            self.async_engine = create_async_engine(async_url, **engine_options(async_url, PoolMonitor(self.name + "-async")))
+            instrument_engine(self.async_engine.sync_engine)
+            self.async_sessionmaker = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+
+    def session(self):
+        # A session with its connection checked out up front, so a replica that is down
+        # is noticed before the route runs; None (and marked unhealthy) when it is
+        db = self.sessionmaker(info={"replica": self.name})
+        try:
+            db.connection()
+        except OperationalError as e:
+            db.close()
+            self.mark_unhealthy(e)
+            return None
+        return db
+
+    async def async_session(self):
+        db = self.async_sessionmaker(info={"replica": self.name})
+        try:
+            await db.connection()
+        except OperationalError as e:
+            await db.close()
+            self.mark_unhealthy(e)
+            return None
+        return db
+
+    def mark_unhealthy(self, error: Exception) -> None:
+        if self.healthy:
+            logger.warning("Read replica %s marked unhealthy: %s", self.name, error)
+        self.healthy = False
+        self.last_error = str(error)
+
+    def check(self) -> bool:
+        if self.engine is None:
+            return False
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            self.mark_unhealthy(e)
+            return False
+        if not self.healthy:
+            logger.info("Read replica %s is healthy again", self.name)
+        self.healthy = True
+        self.last_error = None
+        return True
+
+def from_primary(db) -> bool:
+    # False for sessions opened on a replica by get_read_db, whose data may lag
+    return "replica" not in db.info
+
+# Set on the response to a write; its value is the time (epoch seconds) until which
+# the client's reads go to the primary, on whichever worker serves them
+STICKY_COOKIE = "replica_sticky_until"
+
+def sticky_until(request) -> Optional[float]:
+    try:
+        return float(request.cookies[STICKY_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+# Read replicas for GET routes. Reads are spread round-robin over the healthy
+# replicas and fall back to the primary when none is available. A user who
+# wrote within the last REPLICA_STICKY_SECONDS reads from the primary, so they
+# always see their own writes despite replication lag. The write is remembered
+# in this process and handed to the client as STICKY_COOKIE, so reads served by
+# other workers honour it too.
+class ReplicaSet:
+    def __init__(self, urls: List[str], sticky_seconds: float, check_interval: float):
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.replicas = [Replica(f"replica-{n}", url) for n, url in enumerate(urls)]
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self._recent_writers = TTLCache(maxsize=100000, ttl=sticky_seconds)
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def connect(self, async_url_for=None) -> None:
+        # async_url_for(url) maps a replica URL to its async driver URL in DB_MODE=async
+        for replica in self.replicas:
+            if replica.engine is None:
+                replica.connect(async_url_for(replica.url) if async_url_for else None)
+
+    def mark_write(self, user_id: int, request=None) -> None:
+        # `request` is flagged so ReadYourWritesMiddleware sets STICKY_COOKIE on its response
+        if self.replicas:
+            self._recent_writers.set(user_id, True)
+            if request is not None:
+                request.state.replica_write = True
+
+    def choose(self, user_id: Optional[int], sticky_until: Optional[float] = None) -> Optional[Replica]:
+        # None means "use the primary"; sticky_until comes from the client's STICKY_COOKIE
+        healthy = [r for r in self.replicas if r.healthy]
+        if (not healthy or (sticky_until is not None and sticky_until > time.time())
+                or (user_id is not None and self._recent_writers.get(user_id) is not None)):
+            self.primary_reads += 1
+            return None
+        self.replica_reads += 1
+        return healthy[next(self._counter) % len(healthy)]
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def start(self) -> None:
+        if self._thread is not None or not self.replicas:
+            return
+        self._stop.clear()
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="replica-health-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+                replica.async_engine = None
+            if replica.engine is not None:
+                replica.engine.dispose()
+                replica.engine = None
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "last_error": r.last_error, "pool": r.monitor.status()}
+                for r in self.replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+read_replicas = ReplicaSet(
+    urls=[url.strip() for url in settings.DB_READ_REPLICA_URLS.split(",") if url.strip()],
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+    check_interval=settings.REPLICA_HEALTH_CHECK_SECONDS,
+)
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware adding STICKY_COOKIE to the response of every request
+    flagged by `read_replicas.mark_write`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not read_replicas.replicas:
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.get("replica_write"):
+                seconds = read_replicas.sticky_seconds
+                cookie = f"{STICKY_COOKIE}={time.time() + seconds:.3f}; Max-Age={math.ceil(seconds)}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
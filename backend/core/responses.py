@@ -0,0 +1,66 @@
+import json
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used without it
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# JSON response for payloads that are already plain dicts/lists: skips
+# jsonable_encoder and response_model validation, and uses orjson when installed
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Streams the response while the request body is still being read. Starlette's
+# StreamingResponse watches receive() for a disconnect on older ASGI servers, which
+# would swallow the remaining body chunks; this one only sends.
+class UploadStreamingResponse(StreamingResponse):
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+# Conditional GET helpers. ETags are strong; If-None-Match uses the weak
+# comparison RFC 9110 prescribes for GET, and takes precedence over If-Modified-Since.
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def is_conditional(headers: Mapping[str, str]) -> bool:
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if last_modified is None or not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    # Responses are per user, so shared caches must not store them; clients revalidate each time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from core.config import settings
+from core.database import SessionLocal
+from core.models import Session, User
+from core.security import ACCESS_TOKEN_EXPIRE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: position_i = h1 + i * h2
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+# Per-worker view of recently revoked sessions and per-user revocation epochs,
+# refreshed incrementally from the sessions table. Lookups go through the
+# Bloom filter first; only its (rare) positives are confirmed in the exact map.
+# Entries are dropped once every token they could affect has expired.
+class RevocationList:
+    def __init__(self, refresh_interval: float, max_staleness: float, capacity: int):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.capacity = capacity
+        self.refreshes = 0
+        self.last_refresh: Optional[float] = None
+        self._revoked: Dict[str, datetime] = {}
+        self._epochs: Dict[int, Tuple[int, datetime]] = {}
+        self._bloom = BloomFilter(capacity)
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def window(self) -> timedelta:
+        return timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+    def is_warm(self) -> bool:
+        return self.last_refresh is not None and time.monotonic() - self.last_refresh <= self.max_staleness
+
+    def is_revoked(self, session_id: str, user_id: int, epoch: int) -> bool:
+        current_epoch = self._epochs.get(user_id)
+        if current_epoch is not None and epoch < current_epoch[0]:
+            return True
+        return session_id in self._bloom and session_id in self._revoked
+
+    def add(self, session_id: str, revoked_at: Optional[datetime] = None) -> None:
+        with self._lock:
+            self._add(session_id, revoked_at or datetime.utcnow())
+
+    def set_epoch(self, user_id: int, epoch: int) -> None:
+        with self._lock:
+            self._epochs[user_id] = (epoch, datetime.utcnow())
+
+    def _add(self, session_id: str, revoked_at: datetime) -> None:
+        if session_id not in self._revoked:
+            self._revoked[session_id] = revoked_at
+            if len(self._revoked) > self._bloom.capacity:
+                self._rebuild(self._bloom.capacity * 2)
+            else:
+                self._bloom.add(session_id)
+
+    def _rebuild(self, capacity: int) -> None:
+        bloom = BloomFilter(max(capacity, self.capacity))
+        for session_id in self._revoked:
+            bloom.add(session_id)
+        self._bloom = bloom
+
+    def _prune(self, now: datetime) -> None:
+        cutoff = now - self.window
+        expired = [sid for sid, revoked_at in self._revoked.items() if revoked_at < cutoff]
+        for sid in expired:
+            del self._revoked[sid]
+        for user_id in [uid for uid, (_, seen_at) in self._epochs.items() if seen_at < cutoff]:
+            del self._epochs[user_id]
+        if expired:
+            self._rebuild(self._bloom.capacity)
+
+    def refresh(self) -> None:
+        now = datetime.utcnow()
+        since = self._watermark or now - self.window
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Session.session_id, Session.user_id, Session.revoked_at)
+                .where(Session.revoked_at >= since)
+                .order_by(Session.revoked_at)
+            ).all()
+            user_ids = {row.user_id for row in rows}
+            epochs = db.execute(
+                select(User.id, User.token_epoch).where(User.id.in_(user_ids), User.token_epoch > 0)
+            ).all() if user_ids else []
+        except Exception:
+            logger.exception("Failed to refresh session revocations")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for row in rows:
+                self._add(row.session_id, row.revoked_at)
+            for user_id, epoch in epochs:
+                known = self._epochs.get(user_id)
+                if known is None or known[0] < epoch:
+                    self._epochs[user_id] = (epoch, now)
+            self._prune(now)
+            # Re-read a small overlap next time so rows committed late are not missed
+            self._watermark = (rows[-1].revoked_at if rows else since) - timedelta(seconds=self.refresh_interval)
+            if self._watermark < now - self.window:
+                self._watermark = now - self.window
+        self.refreshes += 1
+        self.last_refresh = time.monotonic()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name="revocation-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "warm": self.is_warm(),
+            "revoked_sessions": len(self._revoked),
+            "user_epochs": len(self._epochs),
+            "bloom_bits": self._bloom.size,
+            "refreshes": self.refreshes,
+        }
+
+revocation_list = RevocationList(
+    refresh_interval=settings.REVOCATION_REFRESH_SECONDS,
+    max_staleness=settings.REVOCATION_MAX_STALENESS_SECONDS,
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+)
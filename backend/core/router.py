@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Path, Query
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import load_only
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from core.models import User, AuthAudit, Session
-from core.database import get_db
+from core.database import get_db, SessionLocal
+from core.replicas import read_replicas, sticky_until
+from sqlalchemy.exc import OperationalError
 from core.schemas import *  # Or import only the specific user/auth schemas you need
-from typing import List
-from core.security import hash_password, verify_password, create_access_token, decode_access_token
-from datetime import datetime
+from typing import List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from core.responses import FastJSONResponse, UploadStreamingResponse
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, parse_fields, split_page
+from core.security import hash_password, verify_and_update_password, create_access_token, decode_access_token
+from core.cache import session_cache, evict_session, evict_user_sessions
+from core.activity import session_activity, record_activity
+from core.audit import audit_pipeline
+from core.revocation import revocation_list
+from core.analytics import as_naive_utc, series_query, series_response, top_query
+from core.user_import import UserImport, existing_emails_sync, import_format, insert_users_sync, iter_lines, iter_records, ndjson_lines
+from core.config import settings
+from datetime import datetime, timedelta
 from uuid import uuid4
 
 router = APIRouter()
@@ -29,7 +43,115 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme), db: Session = Depends(get_db)):
+SESSION_FIELDS = ("session_id", "created_at", "last_active_at", "ip_address", "user_agent", "is_active")
+
+def sessions_page_query(user_id: int, limit: int, cursor: Optional[str], fields: Optional[Set[str]]):
+    # Newest first, keyset on (created_at, id); fetches one extra row to detect a next page
+    query = select(Session).where(Session.user_id == user_id)
+    if fields is not None:
+        query = query.options(load_only(Session.id, Session.created_at, *[getattr(Session, f) for f in fields]))
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, (str, int))
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            Session.created_at < created_at,
+            and_(Session.created_at == created_at, Session.id < last_id),
+        ))
+    return query.order_by(Session.created_at.desc(), Session.id.desc()).limit(limit + 1)
+
+def session_list_response(sessions, limit: int, fields: Optional[Set[str]]):
+    sessions, has_more = split_page(sessions, limit)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor([sessions[-1].created_at.isoformat(), sessions[-1].id])} if has_more else None
+    return FastJSONResponse(
+        [{f: getattr(s, f) for f in SESSION_FIELDS if fields is None or f in fields} for s in sessions],
+        headers=headers,
+    )
+
+# Longest range GET /api/auth/analytics/logins answers (hourly rows per series)
+ANALYTICS_MAX_RANGE = timedelta(days=366)
+
+def login_analytics_range(start: Optional[datetime], end: Optional[datetime], user_id: Optional[int], ip_address: Optional[str]):
+    # Validates the query and picks the rollup series: all logins, one user or one IP
+    end = as_naive_utc(end) if end else datetime.utcnow()
+    start = as_naive_utc(start) if start else end - timedelta(hours=24)
+    if start >= end or end - start > ANALYTICS_MAX_RANGE:
+        raise HTTPException(status_code=400, detail="start must be before end and the range at most 366 days")
+    if user_id is not None and ip_address is not None:
+        raise HTTPException(status_code=400, detail="Filter by user_id or ip_address, not both")
+    if user_id is not None:
+        return start, end, "user", str(user_id)
+    if ip_address is not None:
+        return start, end, "ip", ip_address
+    return start, end, "all", ""
+
+def _detached_copy(obj):
+    # Plain column snapshot that is safe to share between requests and DB sessions
+    return type(obj)(**{c.key: getattr(obj, c.key) for c in obj.__table__.columns})
+
+def access_token_claims(user: User, session_id: str) -> dict:
+    # Carries everything get_current_user needs to authenticate without the database
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "name": user.full_name,
+        "role": user.role,
+        "epoch": user.token_epoch or 0,
+        "session_id": session_id,
+    }
+
+def stateless_user(payload: dict, user_id: int, session_id: str) -> Optional[User]:
+    # Resolves the caller from claims and the in-memory revocation list; None means
+    # the list is not fresh enough (or the token predates these claims) and the
+    # database has to be consulted instead
+    if not settings.AUTH_STATELESS or "epoch" not in payload or not revocation_list.is_warm():
+        return None
+    if revocation_list.is_revoked(session_id, user_id, payload["epoch"]):
+        raise HTTPException(status_code=401, detail="Session invalid or expired")
+    cached = session_cache.get((user_id, session_id))
+    if cached is None:
+        user = User(id=user_id, email=payload.get("email"), full_name=payload.get("name"), role=payload.get("role"), is_active=True)
+        cached = (user, Session(session_id=session_id, user_id=user_id))
+        session_cache.set((user_id, session_id), cached)
+    record_activity(cached[1])
+    return cached[0]
+
+def session_check(token: str):
+    # For long-lived streams that authenticated once: False when the token has expired
+    # or been revoked, True when the revocation list vouches for it, otherwise the
+    # query that returns a row only while the session and token epoch are still valid.
+    # Bypasses session_cache so logouts on other workers are seen at once.
+    try:
+        payload = decode_access_token(token)
+        user_id = int(payload.get("sub"))
+        session_id = payload.get("session_id")
+    except Exception:
+        return False
+    epoch = payload.get("epoch", 0)
+    if settings.AUTH_STATELESS and "epoch" in payload and revocation_list.is_warm():
+        return not revocation_list.is_revoked(session_id, user_id, epoch)
+    return (
+        select(Session.id)
+        .join(User, User.id == Session.user_id)
+        .where(Session.session_id == session_id, Session.user_id == user_id, Session.is_active.is_(True))
+        .where(User.token_epoch <= epoch)
+    )
+
+def session_still_valid(token: str) -> bool:
+    check = session_check(token)
+    if isinstance(check, bool):
+        return check
+    db = SessionLocal()
+    try:
+        return db.execute(check).first() is not None
+    finally:
+        db.close()
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme), db: Session = Depends(get_db)):
     token = credentials.credentials
     try:
         payload = decode_access_token(token)
@@ -37,17 +159,54 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(token_a
         session_id = payload.get("session_id")
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if request.method not in SAFE_METHODS:
+        # Read-your-writes: this user's reads go to the primary for a while
+        read_replicas.mark_write(user_id, request)
+    user = stateless_user(payload, user_id, session_id)
+    if user is not None:
+        return user
+    cached = session_cache.get((user_id, session_id))
+    if cached is not None:
+        record_activity(cached[1])
+        return cached[0]
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if payload.get("epoch", 0) < (user.token_epoch or 0):
+        raise HTTPException(status_code=401, detail="Session invalid or expired")
     # Session check
     session = db.query(Session).filter_by(session_id=session_id, user_id=user_id, is_active=True).first()
     if not session:
         raise HTTPException(status_code=401, detail="Session invalid or expired")
-    # Optionally update last_active_at
-    session.last_active_at = datetime.utcnow()
-    db.commit()
-    return user
+    user_snapshot = _detached_copy(user)
+    session_snapshot = _detached_copy(session)
+    # last_active_at is written behind by core.activity instead of committing here
+    record_activity(session_snapshot)
+    session_cache.set((user_id, session_id), (user_snapshot, session_snapshot))
+    return user_snapshot
+
+def replica_failed(replica, error: OperationalError) -> HTTPException:
+    # A replica that fails mid-request is taken out of rotation; the client retries
+    # and is served by another replica or the primary
+    replica.mark_unhealthy(error)
+    return HTTPException(status_code=503, detail="Read replica unavailable, please retry", headers={"Retry-After": "1"})
+
+def get_read_db(request: Request, current_user: User = Depends(get_current_user)):
+    # Session for GET routes: a healthy read replica, or the primary when there is
+    # none, the replica cannot be reached or this user wrote recently. Must not be
+    # used for writes.
+    replica = read_replicas.choose(current_user.id, sticky_until(request))
+    db = replica.session() if replica is not None else None
+    if db is None:
+        replica, db = None, SessionLocal()
+    try:
+        yield db
+    except OperationalError as e:
+        if replica is not None:
+            raise replica_failed(replica, e)
+        raise
+    finally:
+        db.close()
 
 @core_router.post("/register", response_model=dict, tags=["core"])
 def register(user: UserCreate, db: Session = Depends(get_db)):
@@ -71,16 +230,13 @@ def login(user: UserLogin, db: Session = Depends(get_db), request: Request = Non
     db_user = db.query(User).filter(User.email == user.email).first()
     ip = request.client.host if request else None
     user_agent = request.headers.get("user-agent") if request else None
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    valid, new_hash = verify_and_update_password(user.password, db_user.hashed_password) if db_user else (False, None)
+    if not valid:
         # Log failed login
-        audit = AuthAudit(user_id=db_user.id if db_user else None, event="failed_login", ip_address=ip, user_agent=user_agent)
-        db.add(audit)
-        db.commit()
+        audit_pipeline.record("failed_login", user_id=db_user.id if db_user else None, ip_address=ip, user_agent=user_agent)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     if not db_user.is_active:
-        audit = AuthAudit(user_id=db_user.id, event="failed_login", ip_address=ip, user_agent=user_agent)
-        db.add(audit)
-        db.commit()
+        audit_pipeline.record("failed_login", user_id=db_user.id, ip_address=ip, user_agent=user_agent)
         raise HTTPException(status_code=400, detail="Inactive user")
     # Create session
     session_id = str(uuid4())
@@ -92,12 +248,13 @@ def login(user: UserLogin, db: Session = Depends(get_db), request: Request = Non
         is_active=True
     )
     db.add(session)
+    if new_hash:
+        # Transparently upgrade hashes created with an outdated work factor
+        db_user.hashed_password = new_hash
     db.commit()
     # Log successful login
-    audit = AuthAudit(user_id=db_user.id, event="login", ip_address=ip, user_agent=user_agent)
-    db.add(audit)
-    db.commit()
-    token = create_access_token({"sub": str(db_user.id), "email": db_user.email, "role": db_user.role, "session_id": session_id})
+    audit_pipeline.record("login", user_id=db_user.id, ip_address=ip, user_agent=user_agent, session_id=session_id)
+    token = create_access_token(access_token_claims(db_user, session_id))
     return TokenResponse(access_token=token)
 
 @core_router.post("/logout", response_model=dict, tags=["core"])
@@ -108,15 +265,17 @@ def logout(current_user: User = Depends(get_current_user), db: Session = Depends
     payload = decode_access_token(token)
     session_id = payload.get("session_id")
     session = db.query(Session).filter_by(session_id=session_id, user_id=current_user.id, is_active=True).first()
+    now = datetime.utcnow()
     if session:
         session.is_active = False
-        session.last_active_at = datetime.utcnow()
-        db.commit()
-    # Update the most recent login audit for this user to set logout_timestamp
-    audit = db.query(AuthAudit).filter_by(user_id=current_user.id, event="login").order_by(AuthAudit.timestamp.desc()).first()
-    if audit:
-        audit.logout_timestamp = datetime.utcnow()
+        session.last_active_at = now
+        session.revoked_at = now
         db.commit()
+    revocation_list.add(session_id, now)
+    evict_session(current_user.id, session_id)
+    session_activity.discard(session_id)
+    # Set logout_timestamp on the login audit of this session
+    audit_pipeline.record_logout(session_id)
     return {"msg": "Logged out"}
 
 @core_router.get("/me", response_model=dict, tags=["core"])
@@ -130,25 +289,23 @@ def me(current_user: User = Depends(get_current_user)):
     }
 
 @core_router.get("/sessions", response_model=list, tags=["core"])
-def list_sessions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db), user_id: int = None):
+def list_sessions(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user_id: int = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(SESSION_FIELDS)),
+):
     # Only allow owner or admin
     if user_id is not None:
         if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="Not authorized")
-        sessions = db.query(Session).filter_by(user_id=user_id).all()
     else:
-        sessions = db.query(Session).filter_by(user_id=current_user.id).all()
-    return [
-        {
-            "session_id": s.session_id,
-            "created_at": s.created_at,
-            "last_active_at": s.last_active_at,
-            "ip_address": s.ip_address,
-            "user_agent": s.user_agent,
-            "is_active": s.is_active
-        }
-        for s in sessions
-    ]
+        user_id = current_user.id
+    selected = parse_fields(fields, SESSION_FIELDS)
+    sessions = db.scalars(sessions_page_query(user_id, limit, cursor, selected)).all()
+    return session_list_response(sessions, limit, selected)
 
 @core_router.post("/sessions/{session_id}/revoke", response_model=dict, tags=["core"])
 def revoke_session(session_id: str = Path(...), current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -158,7 +315,74 @@ def revoke_session(session_id: str = Path(...), current_user: User = Depends(get
     # Only allow owner or admin
     if session.user_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
+    now = datetime.utcnow()
     session.is_active = False
-    session.last_active_at = datetime.utcnow()
+    session.last_active_at = now
+    session.revoked_at = now
     db.commit()
-    return {"msg": "Session revoked"} 
\ No newline at end of file
+    revocation_list.add(session_id, now)
+    evict_session(session.user_id, session_id)
+    session_activity.discard(session_id)
+    return {"msg": "Session revoked"}
+
+@core_router.post("/users/{user_id}/deactivate", response_model=dict, tags=["core"])
+def deactivate_user(user_id: int = Path(...), current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    now = datetime.utcnow()
+    user.is_active = False
+    # Invalidates every token issued so far, including ones checked statelessly
+    user.token_epoch = (user.token_epoch or 0) + 1
+    db.query(Session).filter_by(user_id=user_id, is_active=True).update(
+        {Session.is_active: False, Session.last_active_at: now, Session.revoked_at: now}, synchronize_session=False
+    )
+    db.commit()
+    revocation_list.set_epoch(user_id, user.token_epoch)
+    evict_user_sessions(user_id)
+    return {"msg": "User deactivated"}
+
+@core_router.post("/users/import", tags=["core"])
+async def import_users(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson; defaults to the Content-Type"),
+    current_user: User = Depends(get_current_user),
+):
+    # Body and results are both streamed; see core.user_import for the row format
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    fmt = import_format(request.headers.get("content-type"), format)
+    job = UserImport(
+        existing=lambda emails: run_in_threadpool(existing_emails_sync, SessionLocal, emails),
+        insert=lambda rows: run_in_threadpool(insert_users_sync, SessionLocal, rows),
+    )
+    results = job.run(iter_records(iter_lines(request.stream()), fmt))
+    return UploadStreamingResponse(ndjson_lines(results), media_type="application/x-ndjson")
+
+@core_router.get("/analytics/logins", response_model=dict, tags=["core"])
+def login_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    ip_address: Optional[str] = None,
+    top: int = Query(0, ge=0, le=100, description="Also return the users and IPs with the most failed logins"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    # Hourly login/failed-login counts answered from login_rollups, never from auth_audit
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    start, end, dimension, subject = login_analytics_range(start, end, user_id, ip_address)
+    rows = db.execute(series_query(dimension, subject, start, end)).all()
+    leaders = None
+    if top and dimension == "all":
+        leaders = {f"top_{d}s": db.execute(top_query(d, start, end, top)).all() for d in ("user", "ip")}
+    return series_response(start, end, dimension, subject, rows, leaders)
+
+@core_router.get("/session-cache", response_model=dict, tags=["core"])
+def session_cache_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {**session_cache.stats(), "revocation": revocation_list.stats()}
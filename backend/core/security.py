@@ -1,19 +1,135 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 from core.config import settings
+from core.instrumentation import observe_hashing
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes below BCRYPT_ROUNDS are flagged by needs_update and rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def hash_password(password: str) -> str:
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# Dedicated executor for bcrypt so hashing never runs on the event loop or
+# holds the GIL of a request worker. At most `max_workers` hashes run at once
+# and at most `max_pending` may be queued or running; beyond that callers get
+# an immediate 503.
+class HashingExecutor:
+    def __init__(self, kind: str, max_workers: int, max_pending: int):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._pending = 0
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # Workers fork from a clean forkserver (the app process already runs
+                        # background threads) that only preloads this module
+                        mp_context = multiprocessing.get_context("forkserver")
+                        mp_context.set_forkserver_preload([__name__])
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args) -> Future:
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return self.submit(fn, *args).result()
+        finally:
+            observe_hashing(fn.__name__.lstrip("_"), time.perf_counter() - start)
+
+    async def run_async(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args))
+        finally:
+            observe_hashing(fn.__name__.lstrip("_"), time.perf_counter() - start)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self.rejected,
+        }
+
+hashing_executor = HashingExecutor(
+    kind=settings.HASH_EXECUTOR,
+    max_workers=settings.HASH_MAX_CONCURRENCY,
+    max_pending=settings.HASH_MAX_PENDING,
+)
+
+def hash_password(password: str) -> str:
+    return hashing_executor.run(_hash, password)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_executor.run(_verify_and_update, plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated work factor
+    return hashing_executor.run(_verify_and_update, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_executor.run_async(_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await hashing_executor.run_async(_verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -23,4 +139,4 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def decode_access_token(token: str):
-    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]) 
\ No newline at end of file
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -0,0 +1,291 @@
+import asyncio
+import csv
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from core.config import settings
+from core.models import User
+from core.security import hash_password_async, pwd_context
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+IMPORT_ROLES = ("user", "admin")
+
+class ImportedUser(BaseModel):
+    # Limits match the users columns, so rows fail here rather than in the INSERT
+    email: EmailStr = Field(max_length=255)
+    full_name: Optional[str] = Field(None, max_length=255)
+
+def import_format(content_type: Optional[str], requested: Optional[str]) -> str:
+    if requested is not None:
+        if requested not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+        return requested
+    fmt = IMPORT_FORMATS.get((content_type or "").split(";")[0].strip().lower())
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Upload text/csv or application/x-ndjson, or pass ?format=")
+    return fmt
+
+def decode_line(line: bytes, number: int) -> Optional[str]:
+    # None for a line that is not valid UTF-8; it is reported as one invalid row
+    try:
+        return line.decode("utf-8-sig" if number == 1 else "utf-8", errors="strict").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[str]]]:
+    # Splits the request body into numbered lines as it arrives; blank lines are skipped
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > settings.IMPORT_MAX_LINE_BYTES:
+            raise ValueError(f"Line {number + len(lines) + 1} exceeds {settings.IMPORT_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            number += 1
+            text = decode_line(line, number)
+            if text is None or text.strip():
+                yield number, text
+    text = decode_line(buffer, number + 1)
+    if text is None or text.strip():
+        yield number + 1, text
+
+async def iter_records(lines: AsyncIterator[Tuple[int, Optional[str]]], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    # Yields (line, dict) per record, or (line, error message) for unparseable lines.
+    # CSV needs a header row; quoted fields may not span lines.
+    header = None
+    async for number, text in lines:
+        if text is None:
+            yield number, "Unparseable line: not UTF-8"
+            continue
+        try:
+            if fmt == "ndjson":
+                record = json.loads(text)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            elif header is None:
+                header = [name.strip().lower() for name in next(csv.reader([text]))]
+                continue
+            else:
+                record = dict(zip(header, next(csv.reader([text]))))
+        except (ValueError, csv.Error) as e:
+            yield number, f"Unparseable line: {e}"
+            continue
+        yield number, record
+
+def validate_record(record: dict) -> Tuple[Optional[dict], Optional[str]]:
+    # Returns (user row with either password or hashed_password, None) or (None, error)
+    record = {k: v for k, v in record.items() if v not in ("", None)}
+    try:
+        user = ImportedUser(email=record.get("email"), full_name=record.get("full_name"))
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    if not all(isinstance(record.get(k, ""), str) for k in ("password", "password_hash", "role")):
+        return None, "password, password_hash and role must be strings"
+    password, password_hash = record.get("password"), record.get("password_hash")
+    if (password is None) == (password_hash is None):
+        return None, "Exactly one of password or password_hash is required"
+    if password_hash is not None and pwd_context.identify(password_hash, required=False) != "bcrypt":
+        return None, "password_hash is not a bcrypt hash"
+    role = record.get("role", "user")
+    if role not in IMPORT_ROLES:
+        return None, f"role must be one of {', '.join(IMPORT_ROLES)}"
+    return {
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": role,
+        "is_active": True,
+        "password": password,
+        "hashed_password": password_hash,
+    }, None
+
+async def _hash_with_retry(password: str) -> Optional[str]:
+    # The executor refuses work when its queue is full (logins come first); retry with
+    # exponential backoff for up to IMPORT_HASH_WAIT_SECONDS, then give up with None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IMPORT_HASH_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        try:
+            return await hash_password_async(password)
+        except HTTPException as e:
+            if e.status_code != 503:
+                raise
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 2.0)
+
+def existing_emails_query(emails: Iterable[str]):
+    return select(User.email).where(User.email.in_(list(emails)))
+
+def created_ids_query(emails: Iterable[str]):
+    return select(User.email, User.id).where(User.email.in_(list(emails)))
+
+def existing_emails_sync(session_factory, emails: List[str]) -> Set[str]:
+    db = session_factory()
+    try:
+        return {e.lower() for e in db.scalars(existing_emails_query(emails))}
+    finally:
+        db.close()
+
+def row_error(e: DBAPIError) -> str:
+    # The driver's message only; str(e) would echo the statement and its parameters
+    logger.warning("User import row rejected by the database: %s", e.orig)
+    return f"Rejected by the database: {e.orig}"
+
+InsertResult = Tuple[Dict[str, int], Set[str], Dict[str, str]]
+
+def insert_users_sync(session_factory, rows: List[dict]) -> InsertResult:
+    """Inserts one batch in a single transaction.
+
+    Returns ({email: id} of created users, emails rejected as already
+    registered, {email: error} of rows the database refused otherwise). When
+    the batch fails, e.g. because a concurrent registration violates the
+    unique email index, it is retried row by row so one bad row cannot fail
+    the others.
+    """
+    db = session_factory()
+    try:
+        rejected, failed = set(), {}
+        try:
+            db.execute(insert(User), rows)
+            db.commit()
+        except DBAPIError:
+            db.rollback()
+            for row in rows:
+                try:
+                    db.execute(insert(User), [row])
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    rejected.add(row["email"])
+                except DBAPIError as e:
+                    db.rollback()
+                    failed[row["email"]] = row_error(e)
+        created = [r["email"] for r in rows if r["email"] not in rejected and r["email"] not in failed]
+        ids = dict(db.execute(created_ids_query(created)).all()) if created else {}
+        return ids, rejected, failed
+    finally:
+        db.close()
+
+# AsyncSession counterparts for DB_MODE=async
+async def existing_emails_async(session_factory, emails: List[str]) -> Set[str]:
+    async with session_factory() as db:
+        return {e.lower() for e in await db.scalars(existing_emails_query(emails))}
+
+async def insert_users_async(session_factory, rows: List[dict]) -> InsertResult:
+    async with session_factory() as db:
+        rejected, failed = set(), {}
+        try:
+            await db.execute(insert(User), rows)
+            await db.commit()
+        except DBAPIError:
+            await db.rollback()
+            for row in rows:
+                try:
+                    await db.execute(insert(User), [row])
+                    await db.commit()
+                except IntegrityError:
+                    await db.rollback()
+                    rejected.add(row["email"])
+                except DBAPIError as e:
+                    await db.rollback()
+                    failed[row["email"]] = row_error(e)
+        created = [r["email"] for r in rows if r["email"] not in rejected and r["email"] not in failed]
+        ids = dict((await db.execute(created_ids_query(created))).all()) if created else {}
+        return ids, rejected, failed
+
+class UserImport:
+    """Turns a stream of records into a stream of per-row results.
+
+    Records are validated and de-duplicated (case-insensitively) as they
+    arrive. Per batch of IMPORT_BATCH_SIZE users, emails already registered
+    are looked up with `existing(emails)` before any hashing, the remaining
+    plaintext passwords are hashed in parallel on the hashing executor, and
+    the users are inserted in one transaction by `insert(rows)`. The final
+    result is a summary.
+    """
+
+    def __init__(self, existing: Callable[[List[str]], Awaitable[Set[str]]],
+                 insert: Callable[[List[dict]], Awaitable[InsertResult]]):
+        self.existing = existing
+        self.insert = insert
+        self.batch_size = settings.IMPORT_BATCH_SIZE
+        self.counts = {"created": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+        self._seen = set()
+        self._hash_slots = asyncio.Semaphore(settings.IMPORT_HASH_CONCURRENCY)
+
+    def _result(self, line: int, status: str, email: Optional[str] = None, **extra) -> dict:
+        self.counts[status] += 1
+        return {"line": line, "email": email, "status": status, **extra}
+
+    async def _hash(self, password: str) -> Optional[str]:
+        async with self._hash_slots:
+            return await _hash_with_retry(password)
+
+    async def _flush(self, batch: List[Tuple[int, dict]]) -> List[dict]:
+        existing = await self.existing([row["email"] for _, row in batch])
+        fresh = [row for _, row in batch if row["email"].lower() not in existing]
+        hashes = iter(await asyncio.gather(*[self._hash(row["password"]) for row in fresh if row["hashed_password"] is None]))
+        unhashed = set()
+        for row in fresh:
+            if row.pop("password") is not None:
+                row["hashed_password"] = next(hashes)
+                if row["hashed_password"] is None:
+                    unhashed.add(row["email"])
+        fresh = [row for row in fresh if row["email"] not in unhashed]
+        ids, rejected, failed = await self.insert(fresh) if fresh else ({}, set(), {})
+        failed.update((email, "Hashing unavailable, retry this row later") for email in unhashed)
+        results = []
+        for line, row in batch:
+            if row["email"].lower() in existing or row["email"] in rejected:
+                results.append(self._result(line, "exists", row["email"], error="Email already registered"))
+            elif row["email"] in failed:
+                results.append(self._result(line, "invalid", row["email"], error=failed[row["email"]]))
+            else:
+                results.append(self._result(line, "created", row["email"], id=ids.get(row["email"])))
+        return results
+
+    async def run(self, records: AsyncIterator[Tuple[int, object]]) -> AsyncIterator[dict]:
+        batch: List[Tuple[int, dict]] = []
+        try:
+            async for line, record in records:
+                if isinstance(record, str):
+                    yield self._result(line, "invalid", error=record)
+                    continue
+                row, error = validate_record(record)
+                if error is not None:
+                    yield self._result(line, "invalid", record.get("email") if isinstance(record.get("email"), str) else None, error=error)
+                    continue
+                key = row["email"].lower()
+                if key in self._seen:
+                    yield self._result(line, "duplicate", row["email"], error="Email appears earlier in this upload")
+                    continue
+                self._seen.add(key)
+                batch.append((line, row))
+                if len(batch) >= self.batch_size:
+                    for result in await self._flush(batch):
+                        yield result
+                    batch = []
+            if batch:
+                for result in await self._flush(batch):
+                    yield result
+        except ValueError as e:
+            # Malformed stream (e.g. an overlong line); rows already inserted stay
+            yield {"error": str(e), "summary": self.counts}
+            return
+        yield {"summary": self.counts}
+
+def ndjson_lines(results: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async def encode():
+        async for result in results:
+            yield (json.dumps(result) + "\n").encode("utf-8")
+    return encode()
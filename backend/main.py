@@ -1,27 +1,119 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from core.database import get_db, init_db
+from core.config import settings
+from core.database import get_db, init_engines, dispose_engines, pool_monitor, async_pool_monitor
+from core.migrations import check_schema, migrate
+from core.replicas import ReadYourWritesMiddleware, read_replicas
 from core.models import User
-from core.security import hash_password, verify_password, create_access_token
+from core.security import hash_password, verify_password, create_access_token, hashing_executor
 from pydantic import BaseModel, EmailStr
-from core.router import router, core_router
+from core.router import router, core_router, get_current_user
+from core.activity import session_activity
+from core.audit import audit_pipeline
+from core.revocation import revocation_list
+from core.maintenance import maintenance
+from core.instrumentation import MetricsMiddleware, pool_collector
+from core.admission import AdmissionMiddleware, admission
+from core.metrics import registry
 from project.router import project_router
+from project.search import project_search
+from project.events import project_events
 
-app = FastAPI()
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engines are built here rather than at import; the schema is verified with a
+    # single version query (migrations run through `python -m core.cli migrate`)
+    engine = init_engines()
+    if settings.DB_AUTO_MIGRATE:
+        migrate(engine)
+    check_schema(engine)
+    read_replicas.start()
+    session_activity.start()
+    audit_pipeline.start()
+    maintenance.start()
+    if settings.AUTH_STATELESS:
+        revocation_list.start()
+    if settings.SEARCH_INDEX_ENABLED:
+        project_search.start()
+    yield
+    # Ends change-feed streams still open at shutdown
+    project_events.close()
+    # Final flush of buffered last_active_at updates and queued audit events
+    session_activity.stop()
+    audit_pipeline.stop()
+    revocation_list.stop()
+    project_search.stop()
+    maintenance.stop()
+    read_replicas.stop()
+    hashing_executor.shutdown()
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+# Metrics is added last so it wraps admission control and counts shed requests too
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+admission.watch(pool_monitor, async_pool_monitor, hashing_executor=hashing_executor)
+registry.add_collector(admission.collect)
+registry.add_collector(audit_pipeline.collect)
+registry.add_collector(pool_collector(pool_monitor, async_pool_monitor, *[r.monitor for r in read_replicas.replicas]))
 app.include_router(router)
-app.include_router(core_router)
-app.include_router(project_router)
+if settings.DB_MODE == "async":
+    # Imported lazily so sync deployments do not need the asyncio extras
+    from core.async_router import async_core_router
+    from project.async_router import async_project_router
+    from core.async_router import get_current_user_async as get_current_user
+    app.include_router(async_core_router)
+    app.include_router(async_project_router)
+else:
+    app.include_router(core_router)
+    app.include_router(project_router)
 
 @app.get("/live")
 def live():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+    # For the load balancer: 503 while this worker is saturated (see core.admission).
+    # A coroutine so the probe answers on the event loop even when the threadpool is full.
+    ok, signals = admission.ready()
+    if not ok:
+        return JSONResponse(
+            {"status": "saturated", "signals": signals}, status_code=503,
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+    return {"status": "ready", "signals": signals}
+
 @app.get("/test-db")
 def test_db(db: Session = Depends(get_db)):
     try:
         db.execute(text("SELECT 1"))
         return {"db": "ok"}
     except Exception as e:
-        return {"db": "error", "detail": str(e)} 
\ No newline at end of file
+        return {"db": "error", "detail": str(e)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/db-pool")
+def db_pool(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    pools = {"primary": pool_monitor.status()}
+    if async_pool_monitor is not None:
+        pools["async"] = async_pool_monitor.status()
+    if read_replicas.replicas:
+        pools["read_replicas"] = read_replicas.stats()
+    return pools
+
+@app.get("/maintenance")
+def maintenance_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return maintenance.stats()
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.models import User
+from core import database
+from core.database import get_async_db
+from fastapi.security import HTTPAuthorizationCredentials
+from core.async_router import get_current_user_async, get_read_async_db, session_still_valid_async
+from core.router import token_auth_scheme
+from core.replicas import from_primary
+from core.responses import is_conditional, is_not_modified, not_modified_response
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, parse_fields
+from .async_service import create_project, get_project, get_projects_for_user, update_project, delete_project, apply_membership_batch, set_user_role_for_project, remove_user_from_project, get_project_version, get_project_versions_for_user, get_projects_by_ids, search_projects, get_member_project_ids
+from .search import MAX_QUERY_LENGTH, page_after
+from .permissions import require_project_role_async, remember_role
+from .schemas import ProjectCreate, ProjectUpdate, ProjectRead, ProjectUserRoleBase, ProjectMembershipBatch, ProjectMembershipBatchResult
+from .router import PROJECT_FIELDS, project_list_response, member_role, membership_batch_arguments, project_list_etag, project_not_modified, project_detail_response, project_search_response, event_stream_response
+from typing import List, Optional
+
+# Coroutine versions of the project.router routes, mounted instead of them when DB_MODE=async
+async_project_router = APIRouter(prefix="/api/projects", tags=["projects"])
+
+@async_project_router.post("/", response_model=ProjectRead)
+async def create_new_project(
+    project: ProjectCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    return await create_project(db, name=project.name, description=project.description, owner_id=current_user.id)
+
+@async_project_router.get("/", response_model=List[ProjectRead])
+async def list_projects(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(PROJECT_FIELDS)),
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    selected = parse_fields(fields, PROJECT_FIELDS)
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    if is_conditional(request.headers):
+        etag = project_list_etag(await get_project_versions_for_user(db, current_user.id, limit + 1, after_id), limit, selected)
+        if is_not_modified(request.headers, etag):
+            return not_modified_response(etag)
+    projects = await get_projects_for_user(db, user_id=current_user.id, limit=limit + 1, after_id=after_id, fields=selected)
+    return project_list_response(projects, limit, selected)
+
+@async_project_router.get("/events")
+async def project_event_feed(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+    credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme),
+    current_user: User = Depends(get_current_user_async)
+):
+    async def load_projects():
+        async with database.AsyncSessionLocal() as db:
+            return await get_member_project_ids(db, current_user.id)
+    return event_stream_response(request, current_user.id, last_event_id, load_projects, lambda: session_still_valid_async(credentials.credentials))
+
+@async_project_router.get("/search", response_model=List[ProjectRead])
+async def search_project_list(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH, description="Prefix or substring of the name or description"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(PROJECT_FIELDS)),
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    selected = parse_fields(fields, PROJECT_FIELDS)
+    after = decode_cursor(cursor, (int, int)) if cursor else None
+    page = page_after(await search_projects(db, current_user.id, q), limit, after)
+    projects = await get_projects_by_ids(db, [pid for _, pid in page[:limit]], fields=selected)
+    return project_search_response(page, projects, limit, selected)
+
+@async_project_router.get("/{project_id}", response_model=ProjectRead)
+async def get_project_detail(
+    project_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    if is_conditional(request.headers):
+        not_modified = project_not_modified(await get_project_version(db, project_id, current_user.id), current_user.id, project_id, request, from_primary(db))
+        if not_modified is not None:
+            return not_modified
+    project = await get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    role = member_role(project, current_user.id)
+    remember_role(current_user.id, project_id, role, request, from_primary(db))
+    if not role:
+        raise HTTPException(status_code=403, detail="Not authorized for this project")
+    return project_detail_response(project)
+
+@async_project_router.put("/{project_id}", response_model=ProjectRead)
+async def update_project_detail(
+    project_id: int,
+    project_update: ProjectUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    role: str = Depends(require_project_role_async("owner", "developer", detail="Not authorized to update this project"))
+):
+    project = await update_project(db, project_id, name=project_update.name, description=project_update.description)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+@async_project_router.delete("/{project_id}", response_model=dict)
+async def delete_project_detail(
+    project_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    role: str = Depends(require_project_role_async("owner", detail="Only owners can delete the project"))
+):
+    if not await delete_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    return {"msg": "Project deleted"}
+
+@async_project_router.post("/{project_id}/users", response_model=dict)
+async def add_or_update_user_role(
+    project_id: int,
+    user_role: ProjectUserRoleBase,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    role: str = Depends(require_project_role_async("owner", detail="Only owners can manage roles"))
+):
+    await set_user_role_for_project(db, user_id=user_role.user_id, project_id=project_id, role=user_role.role)
+    return {"msg": "User role updated"}
+
+@async_project_router.post("/{project_id}/users/batch", response_model=ProjectMembershipBatchResult)
+async def batch_update_user_roles(
+    project_id: int,
+    batch: ProjectMembershipBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    role: str = Depends(require_project_role_async("owner", detail="Only owners can manage roles"))
+):
+    upserts, removals = membership_batch_arguments(batch)
+    return {"results": await apply_membership_batch(db, project_id, upserts, removals)}
+
+@async_project_router.delete("/{project_id}/users/{user_id}", response_model=dict)
+async def remove_user_from_project_route(
+    project_id: int,
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    role: str = Depends(require_project_role_async("owner", detail="Only owners can remove users"))
+):
+    await remove_user_from_project(db, user_id=user_id, project_id=project_id)
+    return {"msg": "User removed from project"}
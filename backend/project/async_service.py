@@ -0,0 +1,133 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from .models import Project, ProjectUserRole
+from .permissions import invalidate_role, invalidate_project_roles
+from .search import normalize, project_search, rank_rows
+from .events import membership_changes, project_events, project_payload
+from .service import members_loader, membership_batch_queries, membership_batch_writes, plan_membership_batch, project_load_options, project_version_query, project_versions_page_query, bump_members_version, accessible_projects_query, search_fallback_query, publish_membership_batch
+from typing import Dict, List, Optional, Set, Tuple
+
+# Async counterparts of project.service for DB_MODE=async. Relationships are
+# loaded with selectinload because lazy loading is not available on AsyncSession.
+
+async def create_project(db: AsyncSession, name: str, description: Optional[str], owner_id: int) -> Project:
+    project = Project(name=name, description=description)
+    db.add(project)
+    await db.flush()
+    db.add(ProjectUserRole(user_id=owner_id, project_id=project.id, role="owner"))
+    await db.commit()
+    invalidate_role(owner_id, project.id)
+    project_search.add(project.id, project.name, project.description)
+    project_events.publish("project.created", project.id, project_payload(project), added={owner_id})
+    return project
+
+async def get_project_version(db: AsyncSession, project_id: int, user_id: int):
+    return (await db.execute(project_version_query(project_id, user_id))).first()
+
+async def get_project_versions_for_user(db: AsyncSession, user_id: int, limit: int, after_id: Optional[int] = None):
+    return (await db.execute(project_versions_page_query(user_id, limit, after_id))).all()
+
+async def get_project(db: AsyncSession, project_id: int) -> Optional[Project]:
+    result = await db.execute(
+        select(Project)
+        .options(members_loader())
+        .where(Project.id == project_id)
+    )
+    return result.scalars().first()
+
+async def get_projects_for_user(db: AsyncSession, user_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, fields: Optional[Set[str]] = None) -> List[Project]:
+    stmt = select(Project).join(ProjectUserRole).where(ProjectUserRole.user_id == user_id)
+    stmt = stmt.options(*project_load_options(fields))
+    if after_id is not None:
+        stmt = stmt.where(Project.id > after_id)
+    stmt = stmt.order_by(Project.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+async def get_projects_by_ids(db: AsyncSession, project_ids: List[int], fields: Optional[Set[str]] = None) -> List[Project]:
+    if not project_ids:
+        return []
+    result = await db.execute(select(Project).options(*project_load_options(fields)).where(Project.id.in_(project_ids)))
+    return list(result.scalars().all())
+
+async def get_member_project_ids(db: AsyncSession, user_id: int) -> Set[int]:
+    return set(await db.scalars(accessible_projects_query(user_id)))
+
+async def search_projects(db: AsyncSession, user_id: int, query: str) -> List[Tuple[int, int]]:
+    if project_search.ready:
+        return project_search.search(query, set(await db.scalars(accessible_projects_query(user_id))))
+    return rank_rows(query, (await db.execute(search_fallback_query(user_id, normalize(query)))).all())
+
+async def update_project(db: AsyncSession, project_id: int, name: Optional[str], description: Optional[str]) -> Optional[Project]:
+    project = await db.get(Project, project_id)
+    if not project:
+        return None
+    if name is not None:
+        project.name = name
+    if description is not None:
+        project.description = description
+    project.version = Project.version + 1
+    await db.commit()
+    await db.refresh(project)
+    project_search.add(project.id, project.name, project.description)
+    project_events.publish("project.updated", project.id, project_payload(project))
+    return project
+
+async def delete_project(db: AsyncSession, project_id: int) -> bool:
+    # user_roles must be loaded up front for the delete-orphan cascade
+    result = await db.execute(select(Project).options(selectinload(Project.user_roles)).where(Project.id == project_id))
+    project = result.scalars().first()
+    if not project:
+        return False
+    await db.delete(project)
+    await db.commit()
+    invalidate_project_roles(project_id)
+    project_search.remove(project_id)
+    project_events.publish("project.deleted", project_id, {})
+    return True
+
+async def get_user_role_for_project(db: AsyncSession, user_id: int, project_id: int) -> Optional[str]:
+    result = await db.execute(
+        select(ProjectUserRole.role).where(ProjectUserRole.user_id == user_id, ProjectUserRole.project_id == project_id)
+    )
+    return result.scalars().first()
+
+async def set_user_role_for_project(db: AsyncSession, user_id: int, project_id: int, role: str) -> ProjectUserRole:
+    pur = await db.get(ProjectUserRole, (user_id, project_id))
+    if pur:
+        pur.role = role
+    else:
+        pur = ProjectUserRole(user_id=user_id, project_id=project_id, role=role)
+        db.add(pur)
+    await db.execute(bump_members_version(project_id))
+    await db.commit()
+    invalidate_role(user_id, project_id)
+    project_events.publish("members.changed", project_id, **membership_changes([(user_id, role)]))
+    return pur
+
+async def remove_user_from_project(db: AsyncSession, user_id: int, project_id: int) -> bool:
+    pur = await db.get(ProjectUserRole, (user_id, project_id))
+    if not pur:
+        return False
+    await db.delete(pur)
+    await db.execute(bump_members_version(project_id))
+    await db.commit()
+    invalidate_role(user_id, project_id)
+    project_events.publish("members.changed", project_id, **membership_changes([(user_id, None)]))
+    return True
+
+async def apply_membership_batch(db: AsyncSession, project_id: int, upserts: Dict[int, str], removals: List[int]) -> List[dict]:
+    users_query, members_query = membership_batch_queries(project_id, upserts, removals)
+    existing_users = set(await db.scalars(users_query)) if upserts else set()
+    current = dict((await db.execute(members_query)).all())
+    rows, remove_ids, results = plan_membership_batch(project_id, upserts, removals, existing_users, current)
+    for statement in membership_batch_writes(db.bind.dialect.name, project_id, rows, remove_ids):
+        await db.execute(statement)
+    await db.commit()
+    for user_id in [row["user_id"] for row in rows] + remove_ids:
+        invalidate_role(user_id, project_id)
+    publish_membership_batch(project_id, rows, remove_ids)
+    return results
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ProjectEvent:
+    __slots__ = ("seq", "type", "project_id", "data", "added", "removed")
+
+    def __init__(self, seq: int, type: str, project_id: int, data: dict, added: Set[int], removed: Set[int]):
+        self.seq = seq
+        self.type = type
+        self.project_id = project_id
+        self.data = data
+        # Users who gained / lost access to the project with this event
+        self.added = added
+        self.removed = removed
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+        # Last sequence number published before subscribing; later events all reach the queue
+        self.seq = 0
+
+    def _put(self, event: Optional[ProjectEvent]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A reader this far behind resynchronises with a reset instead of blocking writers
+            self.overflowed = True
+
+# In-process pub/sub for project changes. project.service publishes after each
+# commit (from request threads or the event loop); every subscriber gets every
+# event and filters by its user's memberships. The last EVENTS_BUFFER_SIZE
+# events are kept so a reconnecting client can resume from its last event id,
+# "<epoch>:<seq>", where the epoch identifies this process.
+class ProjectEventBroker:
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.queue_size = queue_size
+        self.published = 0
+        self._buffer: "deque[ProjectEvent]" = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def event_id(self, event: ProjectEvent) -> str:
+        return f"{self.epoch}:{event.seq}"
+
+    def publish(self, type: str, project_id: int, data: dict, added: Set[int] = frozenset(), removed: Set[int] = frozenset()) -> None:
+        with self._lock:
+            self._seq += 1
+            event = ProjectEvent(self._seq, type, project_id, data, set(added), set(removed))
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        self.published += 1
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            sub.seq = self._seq
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def since(self, last_event_id: str) -> Tuple[List[ProjectEvent], bool]:
+        # Buffered events after `last_event_id`; False when they cannot all be replayed
+        epoch, _, seq = last_event_id.partition(":")
+        if epoch != self.epoch or not seq.isdigit():
+            return [], False
+        seq = int(seq)
+        with self._lock:
+            events = [e for e in self._buffer if e.seq > seq]
+            oldest = self._buffer[0].seq if self._buffer else self._seq + 1
+        return events, seq >= oldest - 1
+
+    def close(self) -> None:
+        # Ends every open stream, called at shutdown
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, None)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        return {"epoch": self.epoch, "subscribers": len(self._subscribers), "published": self.published, "buffered": len(self._buffer)}
+
+project_events = ProjectEventBroker(buffer_size=settings.EVENTS_BUFFER_SIZE, queue_size=settings.EVENTS_QUEUE_SIZE)
+
+def project_payload(project) -> dict:
+    return {"id": project.id, "name": project.name, "description": project.description}
+
+def membership_changes(changes: List[Tuple[int, Optional[str]]]) -> dict:
+    # (user_id, role) pairs, role None for removals
+    return {
+        "data": {"changes": [{"user_id": user_id, "role": role} for user_id, role in changes]},
+        "added": {user_id for user_id, role in changes if role is not None},
+        "removed": {user_id for user_id, role in changes if role is None},
+    }
+
+def visible(event: ProjectEvent, user_id: int, projects: Set[int]) -> bool:
+    # Keeps `projects` (the user's memberships) in step with the events it sees
+    if user_id in event.added:
+        projects.add(event.project_id)
+    shown = event.project_id in projects
+    if user_id in event.removed or event.type == "project.deleted":
+        projects.discard(event.project_id)
+    return shown
+
+def sse_position(event_id: str) -> bytes:
+    # An id without data: sets the client's Last-Event-ID without dispatching an event
+    return f"id: {event_id}\n\n".encode()
+
+def sse_message(event_id: Optional[str], type: str, data: dict) -> bytes:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {type}", "data: " + json.dumps(data, default=str)]
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+async def event_stream(user_id: int, last_event_id: Optional[str], load_projects: Callable[[], Awaitable[Set[int]]],
+                       authorized: Callable[[], Awaitable[bool]]) -> AsyncIterator[bytes]:
+    """Server-sent events for one client.
+
+    Subscribes before reading the user's memberships so nothing published in
+    between is lost, replays buffered events after `last_event_id`, then
+    streams live ones with a keepalive comment every EVENTS_KEEPALIVE_SECONDS.
+    A `reset` event tells the client to refetch: sent when the resume point is
+    gone (other process, restart, buffer wrapped) or the client fell behind.
+    A bare `id:` line is sent when the stream opens and again when it ends,
+    so even a client that saw no event has a resume point. The stream ends
+    after EVENTS_MAX_STREAM_SECONDS, or at shutdown; the client reconnects
+    with that id and misses nothing still in the buffer. It also ends as soon
+    as `authorized()`, checked every EVENTS_KEEPALIVE_SECONDS, reports the
+    caller's token expired or revoked.
+    """
+    broker = project_events
+    sub = broker.subscribe()
+    try:
+        projects = await load_projects()
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n".encode()
+        replay, complete = broker.since(last_event_id) if last_event_id else ([], True)
+        if not complete:
+            yield sse_message(None, "reset", {"reason": "resume point unavailable"})
+        sent = 0
+        for event in replay:
+            sent = event.seq
+            if visible(event, user_id, projects):
+                yield sse_message(broker.event_id(event), event.type, {"project_id": event.project_id, **event.data})
+        # Everything up to here was replayed or predates the memberships just loaded
+        sent = max(sent, sub.seq)
+        yield sse_position(f"{broker.epoch}:{sent}")
+        loop = asyncio.get_running_loop()
+        ends = loop.time() + settings.EVENTS_MAX_STREAM_SECONDS
+        next_check = loop.time() + settings.EVENTS_KEEPALIVE_SECONDS
+        while True:
+            now = loop.time()
+            if now >= ends:
+                # Events still queued have seq > sent and are replayed on reconnect
+                yield sse_position(f"{broker.epoch}:{sent}")
+                return
+            if now >= next_check:
+                if not await authorized():
+                    return
+                next_check = loop.time() + settings.EVENTS_KEEPALIVE_SECONDS
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=min(next_check, ends) - now)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                yield sse_position(f"{broker.epoch}:{sent}")
+                return
+            if sub.overflowed:
+                yield sse_message(None, "reset", {"reason": "client too slow"})
+                return
+            if event.seq <= sent:
+                continue
+            sent = event.seq
+            if visible(event, user_id, projects):
+                yield sse_message(broker.event_id(event), event.type, {"project_id": event.project_id, **event.data})
+    finally:
+        broker.unsubscribe(sub)
@@ -18,4 +18,7 @@ class Project(Base):
     description = Column(String(1024), nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Bumped on every change to the project's own fields / to its membership; together they form the ETag
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    members_version = Column(Integer, default=1, server_default="1", nullable=False)
     user_roles = relationship("ProjectUserRole", back_populates="project", cascade="all, delete-orphan") 
\ No newline at end of file
@@ -0,0 +1,88 @@
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from core.cache import TTLCache
+from core.config import settings
+from core.database import get_db
+from core.models import User
+from core.router import get_current_user
+from .models import ProjectUserRole
+
+# (user_id, project_id) -> (role,) with role None for non-members. Writes in
+# project.service invalidate entries; other workers see changes after the TTL.
+role_cache = TTLCache(maxsize=settings.ROLE_CACHE_SIZE, ttl=settings.ROLE_CACHE_TTL_SECONDS)
+
+def invalidate_role(user_id: int, project_id: int) -> None:
+    role_cache.pop((user_id, project_id))
+
+def invalidate_project_roles(project_id: int) -> None:
+    role_cache.pop_where(lambda key: key[1] == project_id)
+
+def _request_memo(request: Optional[Request]) -> dict:
+    if request is None:
+        return {}
+    memo = getattr(request.state, "project_roles", None)
+    if memo is None:
+        memo = request.state.project_roles = {}
+    return memo
+
+def remember_role(user_id: int, project_id: int, role: Optional[str], request: Optional[Request] = None, shared: bool = True) -> None:
+    # For callers that already know the role, e.g. from a loaded project.user_roles.
+    # Roles read from a replica may be stale and must pass shared=False: role_cache
+    # authorizes writes, so it is only filled from the primary.
+    _request_memo(request)[(user_id, project_id)] = role
+    if shared:
+        role_cache.set((user_id, project_id), (role,))
+
+def _role_query(user_id: int, project_id: int):
+    return select(ProjectUserRole.role).where(ProjectUserRole.user_id == user_id, ProjectUserRole.project_id == project_id)
+
+def resolve_role(db: Session, user_id: int, project_id: int, request: Optional[Request] = None) -> Optional[str]:
+    memo = _request_memo(request)
+    key = (user_id, project_id)
+    if key in memo:
+        return memo[key]
+    cached = role_cache.get(key)
+    if cached is not None:
+        role = cached[0]
+    else:
+        role = db.scalars(_role_query(user_id, project_id)).first()
+        role_cache.set(key, (role,))
+    memo[key] = role
+    return role
+
+async def resolve_role_async(db, user_id: int, project_id: int, request: Optional[Request] = None) -> Optional[str]:
+    memo = _request_memo(request)
+    key = (user_id, project_id)
+    if key in memo:
+        return memo[key]
+    cached = role_cache.get(key)
+    if cached is not None:
+        role = cached[0]
+    else:
+        role = (await db.scalars(_role_query(user_id, project_id))).first()
+        role_cache.set(key, (role,))
+    memo[key] = role
+    return role
+
+def _check(role: Optional[str], roles: tuple, detail: str) -> str:
+    if role is None or (roles and role not in roles):
+        raise HTTPException(status_code=403, detail=detail)
+    return role
+
+def require_project_role(*roles: str, detail: str = "Not authorized for this project"):
+    # Route dependency: resolves the caller's role on {project_id} and returns it,
+    # or raises 403 when it is missing or not one of `roles` (any role if empty)
+    def dependency(project_id: int, request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)) -> str:
+        return _check(resolve_role(db, current_user.id, project_id, request), roles, detail)
+    return dependency
+
+def require_project_role_async(*roles: str, detail: str = "Not authorized for this project"):
+    # Imported here so sync deployments never load the asyncio extras
+    from core.database import get_async_db
+    from core.async_router import get_current_user_async
+
+    async def dependency(project_id: int, request: Request, db=Depends(get_async_db), current_user: User = Depends(get_current_user_async)) -> str:
+        return _check(await resolve_role_async(db, current_user.id, project_id, request), roles, detail)
+    return dependency
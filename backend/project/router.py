@@ -1,15 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from core.models import User
-from core.database import get_db
-from .service import create_project, get_project, get_projects_for_user, update_project, delete_project, get_user_role_for_project, set_user_role_for_project, remove_user_from_project
-from .schemas import ProjectCreate, ProjectUpdate, ProjectRead, ProjectUserRoleBase, ProjectUserRoleRead
-from typing import List
-from core.router import get_current_user
-from core.schemas import UserRead
+from core.database import get_db, SessionLocal
+from .service import create_project, get_project, get_projects_for_user, update_project, delete_project, set_user_role_for_project, remove_user_from_project, apply_membership_batch, get_project_version, get_project_versions_for_user, get_projects_by_ids, search_projects, get_member_project_ids
+from .events import event_stream
+from .search import MAX_QUERY_LENGTH, page_after, project_search
+from .permissions import require_project_role, remember_role
+from .schemas import ProjectCreate, ProjectUpdate, ProjectRead, ProjectUserRoleBase, ProjectMembershipBatch, ProjectMembershipBatchResult
+from typing import List, Optional, Set
+from fastapi.security import HTTPAuthorizationCredentials
+from core.router import get_current_user, get_read_db, session_still_valid, token_auth_scheme
+from core.replicas import from_primary
+from core.responses import FastJSONResponse, is_conditional, is_not_modified, not_modified_response, validator_headers
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, parse_fields, split_page
 
 project_router = APIRouter(prefix="/api/projects", tags=["projects"])
 
+# Same key order as ProjectRead
+PROJECT_FIELDS = ("name", "description", "id", "created_at", "updated_at", "users")
+
+# Responses are built as plain dicts straight from the ORM rows and returned
+# as FastJSONResponse, so each object is serialized exactly once
+def _user_dict(user) -> Optional[dict]:
+    if user is None:
+        return None
+    return {
+        "email": user.email,
+        "full_name": user.full_name,
+        "id": user.id,
+        "created_at": user.created_at,
+        "updated_at": None,
+    }
+
+def _member_dict(ur) -> dict:
+    return {"user_id": ur.user_id, "role": ur.role, "project_id": ur.project_id, "user": _user_dict(ur.user)}
+
+def project_dict(project, fields: Optional[Set[str]] = None) -> dict:
+    # Only touches the requested attributes so deferred columns are never loaded
+    data = {}
+    for field in PROJECT_FIELDS:
+        if fields is not None and field not in fields:
+            continue
+        if field == "users":
+            data["users"] = [_member_dict(ur) for ur in project.user_roles]
+        else:
+            data[field] = getattr(project, field)
+    return data
+
+def member_role(project, user_id: int) -> Optional[str]:
+    # The role is already part of the loaded members, no separate lookup needed
+    return next((ur.role for ur in project.user_roles if ur.user_id == user_id), None)
+
+def membership_batch_arguments(batch: ProjectMembershipBatch):
+    upserts = {m.user_id: m.role for m in batch.upsert}
+    removals = list(dict.fromkeys(batch.remove))
+    if len(upserts) != len(batch.upsert) or len(removals) != len(batch.remove) or upserts.keys() & set(removals):
+        raise HTTPException(status_code=400, detail="Each user may appear only once per batch")
+    return upserts, removals
+
+def project_etag(project) -> str:
+    # Accepts Project instances and rows of the version queries alike
+    return f'"p{project.id}-{project.version}-{project.members_version}"'
+
+def project_list_etag(projects, limit: int, fields: Optional[Set[str]]) -> str:
+    # Covers the page's membership set (including the look-ahead row) and every project's versions
+    key = repr((limit, sorted(fields) if fields is not None else None, [(p.id, p.version, p.members_version) for p in projects]))
+    return '"l%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+def project_not_modified(versions, user_id: int, project_id: int, request: Request, shared: bool = True):
+    # Answers a conditional GET from the version row alone; None means the full project must be sent.
+    # `shared` as for remember_role: False when `versions` was read from a replica.
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    remember_role(user_id, project_id, versions.role, request, shared)
+    if not versions.role:
+        raise HTTPException(status_code=403, detail="Not authorized for this project")
+    etag = project_etag(versions)
+    if is_not_modified(request.headers, etag, versions.updated_at):
+        return not_modified_response(etag, versions.updated_at)
+    return None
+
+def project_detail_response(project) -> FastJSONResponse:
+    return FastJSONResponse(project_dict(project), headers=validator_headers(project_etag(project), project.updated_at))
+
+def project_list_response(projects, limit: int, fields: Optional[Set[str]]) -> FastJSONResponse:
+    # No Last-Modified here: losing access to a project changes the page without changing any timestamp
+    headers = validator_headers(project_list_etag(projects, limit, fields))
+    projects, has_more = split_page(projects, limit)
+    if has_more:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor([projects[-1].id])
+    return FastJSONResponse([project_dict(p, fields) for p in projects], headers=headers)
+
+def project_search_response(page, projects, limit: int, fields: Optional[Set[str]]) -> FastJSONResponse:
+    # `page` is the ranked (score, id) slice from page_after; the cursor is the last entry's key
+    page, has_more = split_page(page, limit)
+    by_id = {p.id: p for p in projects}
+    # Deleted by another worker since the index last refreshed
+    project_search.discard_missing(pid for _, pid in page if pid not in by_id)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(list(page[-1]))} if has_more else {}
+    return FastJSONResponse([project_dict(by_id[pid], fields) for _, pid in page if pid in by_id], headers=headers)
+
+def event_stream_response(request: Request, user_id: int, last_event_id: Optional[str], load_projects, authorized) -> StreamingResponse:
+    # EventSource sends Last-Event-ID on reconnect; the query parameter is for other clients
+    resume = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        event_stream(user_id, resume, load_projects, authorized),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @project_router.post("/", response_model=ProjectRead)
 def create_new_project(
     project: ProjectCreate,
@@ -21,71 +123,87 @@ def create_new_project(
 
 @project_router.get("/", response_model=List[ProjectRead])
 def list_projects(
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(PROJECT_FIELDS)),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    projects = get_projects_for_user(db, user_id=current_user.id)
-    result = []
-    for project in projects:
-        users = [
-            ProjectUserRoleRead(
-                user_id=ur.user_id,
-                project_id=ur.project_id,
-                role=ur.role,
-                user=UserRead.model_validate(ur.user) if ur.user else None
-            )
-            for ur in project.user_roles
-        ]
-        result.append(ProjectRead(
-            id=project.id,
-            name=project.name,
-            description=project.description,
-            created_at=project.created_at,
-            updated_at=project.updated_at,
-            users=users
-        ))
-    return result
+    selected = parse_fields(fields, PROJECT_FIELDS)
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    if is_conditional(request.headers):
+        etag = project_list_etag(get_project_versions_for_user(db, current_user.id, limit + 1, after_id), limit, selected)
+        if is_not_modified(request.headers, etag):
+            return not_modified_response(etag)
+    projects = get_projects_for_user(db, user_id=current_user.id, limit=limit + 1, after_id=after_id, fields=selected)
+    return project_list_response(projects, limit, selected)
+
+# Declared before /{project_id} so "events" is not taken for a project id
+@project_router.get("/events")
+async def project_event_feed(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+    credentials: HTTPAuthorizationCredentials = Depends(token_auth_scheme),
+    current_user: User = Depends(get_current_user)
+):
+    # Server-sent project and membership changes for the caller's projects (see project.events)
+    def load_projects():
+        db = SessionLocal()
+        try:
+            return get_member_project_ids(db, current_user.id)
+        finally:
+            db.close()
+    return event_stream_response(
+        request, current_user.id, last_event_id,
+        lambda: run_in_threadpool(load_projects),
+        lambda: run_in_threadpool(session_still_valid, credentials.credentials),
+    )
+
+# Declared before /{project_id} so "search" is not taken for a project id
+@project_router.get("/search", response_model=List[ProjectRead])
+def search_project_list(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH, description="Prefix or substring of the name or description"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of " + ", ".join(PROJECT_FIELDS)),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    selected = parse_fields(fields, PROJECT_FIELDS)
+    after = decode_cursor(cursor, (int, int)) if cursor else None
+    page = page_after(search_projects(db, current_user.id, q), limit, after)
+    projects = get_projects_by_ids(db, [pid for _, pid in page[:limit]], fields=selected)
+    return project_search_response(page, projects, limit, selected)
 
 @project_router.get("/{project_id}", response_model=ProjectRead)
 def get_project_detail(
     project_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
+    if is_conditional(request.headers):
+        not_modified = project_not_modified(get_project_version(db, project_id, current_user.id), current_user.id, project_id, request, from_primary(db))
+        if not_modified is not None:
+            return not_modified
     project = get_project(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    role = get_user_role_for_project(db, current_user.id, project_id)
+    role = member_role(project, current_user.id)
+    remember_role(current_user.id, project_id, role, request, from_primary(db))
     if not role:
         raise HTTPException(status_code=403, detail="Not authorized for this project")
-    users = [
-        ProjectUserRoleRead(
-            user_id=ur.user_id,
-            project_id=ur.project_id,
-            role=ur.role,
-            user=UserRead.model_validate(ur.user) if ur.user else None
-        )
-        for ur in project.user_roles
-    ]
-    return ProjectRead(
-        id=project.id,
-        name=project.name,
-        description=project.description,
-        created_at=project.created_at,
-        updated_at=project.updated_at,
-        users=users
-    )
+    return project_detail_response(project)
 
 @project_router.put("/{project_id}", response_model=ProjectRead)
 def update_project_detail(
     project_id: int,
     project_update: ProjectUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    role: str = Depends(require_project_role("owner", "developer", detail="Not authorized to update this project"))
 ):
-    role = get_user_role_for_project(db, current_user.id, project_id)
-    if role not in ["owner", "developer"]:
-        raise HTTPException(status_code=403, detail="Not authorized to update this project")
     project = update_project(db, project_id, name=project_update.name, description=project_update.description)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -95,11 +213,9 @@ def update_project_detail(
 def delete_project_detail(
     project_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    role: str = Depends(require_project_role("owner", detail="Only owners can delete the project"))
 ):
-    role = get_user_role_for_project(db, current_user.id, project_id)
-    if role != "owner":
-        raise HTTPException(status_code=403, detail="Only owners can delete the project")
     success = delete_project(db, project_id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -110,25 +226,30 @@ def add_or_update_user_role(
     project_id: int,
     user_role: ProjectUserRoleBase,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    role: str = Depends(require_project_role("owner", detail="Only owners can manage roles"))
 ):
-    # Only owner can add/update roles
-    role = get_user_role_for_project(db, current_user.id, project_id)
-    if role != "owner":
-        raise HTTPException(status_code=403, detail="Only owners can manage roles")
     set_user_role_for_project(db, user_id=user_role.user_id, project_id=project_id, role=user_role.role)
     return {"msg": "User role updated"}
 
+@project_router.post("/{project_id}/users/batch", response_model=ProjectMembershipBatchResult)
+def batch_update_user_roles(
+    project_id: int,
+    batch: ProjectMembershipBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    role: str = Depends(require_project_role("owner", detail="Only owners can manage roles"))
+):
+    upserts, removals = membership_batch_arguments(batch)
+    return {"results": apply_membership_batch(db, project_id, upserts, removals)}
+
 @project_router.delete("/{project_id}/users/{user_id}", response_model=dict)
 def remove_user_from_project_route(
     project_id: int,
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    role: str = Depends(require_project_role("owner", detail="Only owners can remove users"))
 ):
-    # Only owner can remove users
-    role = get_user_role_for_project(db, current_user.id, project_id)
-    if role != "owner":
-        raise HTTPException(status_code=403, detail="Only owners can remove users")
     remove_user_from_project(db, user_id=user_id, project_id=project_id)
     return {"msg": "User removed from project"} 
\ No newline at end of file
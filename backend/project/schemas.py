@@ -29,4 +29,16 @@ class ProjectRead(ProjectBase):
     updated_at: datetime
     users: List[ProjectUserRoleRead] = []
 
-    model_config = {'from_attributes': True} 
\ No newline at end of file
+    model_config = {'from_attributes': True}
+
+class ProjectMembershipBatch(BaseModel):
+    upsert: List[ProjectUserRoleBase] = Field(default_factory=list, max_length=1000)
+    remove: List[int] = Field(default_factory=list, max_length=1000)
+
+class ProjectMembershipResult(BaseModel):
+    user_id: int
+    status: str  # "added", "updated", "unchanged", "removed", "not_member", "user_not_found"
+    role: Optional[str] = None
+
+class ProjectMembershipBatchResult(BaseModel):
+    results: List[ProjectMembershipResult]
@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select
+from core.config import settings
+from core.database import SessionLocal
+from .models import Project
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_LENGTH = 100
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").casefold().split())
+
+def document_trigrams(text: str) -> Set[str]:
+    # pg_trgm style: every word padded with two leading and one trailing blank,
+    # so one- and two-letter word prefixes have trigrams of their own
+    grams = set()
+    for word in text.split():
+        padded = "  " + word + " "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def query_trigrams(query: str) -> Set[str]:
+    # Trigrams every matching document must contain. Words of three or more
+    # letters use their inner trigrams (any substring); shorter words can only
+    # be matched as word prefixes.
+    grams = set()
+    for word in query.split():
+        if len(word) >= 3:
+            grams.update(word[i:i + 3] for i in range(len(word) - 2))
+        else:
+            grams.add(("  " + word)[:3] if len(word) == 1 else " " + word)
+    return grams
+
+def score(query: str, name: str, description: str) -> int:
+    # Higher is better; 0 means no match. Name hits outrank description hits,
+    # exact > prefix > word prefix > substring, shorter names first on ties.
+    if name == query:
+        base = 6
+    elif name.startswith(query):
+        base = 5
+    elif (" " + name).find(" " + query) >= 0:
+        base = 4
+    elif query in name:
+        base = 3
+    elif (" " + description).find(" " + query) >= 0:
+        base = 2
+    elif query in description:
+        base = 1
+    else:
+        return 0
+    return base * 1000 + max(999 - len(name), 0)
+
+def rank_rows(query: str, rows) -> List[Tuple[int, int]]:
+    # Same ranking for (id, name, description) rows read from the database
+    query = normalize(query)
+    results = [(score(query, normalize(row.name), normalize(row.description)), row.id) for row in rows]
+    return sorted(((s, pid) for s, pid in results if s), key=lambda r: (-r[0], r[1]))
+
+def page_after(ranked: List[Tuple[int, int]], limit: int, after: Optional[list] = None) -> List[Tuple[int, int]]:
+    # Keyset page over (score desc, id asc); returns limit + 1 entries for split_page
+    if after is not None:
+        key = (-after[0], after[1])
+        ranked = [r for r in ranked if (-r[0], r[1]) > key]
+    return ranked[:limit + 1]
+
+# In-process trigram index over Project.name and description. Every worker
+# keeps its own copy: writes made here are applied immediately, writes made by
+# other workers are picked up from Project.updated_at every refresh interval.
+# Entries of projects deleted elsewhere are dropped when a search finds them
+# missing. Access control always happens against the database.
+class ProjectSearchIndex:
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.ready = False
+        self._postings: Dict[str, Set[int]] = {}
+        # Only the normalized text is kept per project; its trigrams are recomputed on removal
+        self._documents: Dict[int, Tuple[str, str]] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, project_id: int, name: Optional[str], description: Optional[str]) -> None:
+        name, description = normalize(name), normalize(description)
+        with self._lock:
+            self._remove(project_id)
+            self._documents[project_id] = (name, description)
+            for gram in document_trigrams(name + " " + description):
+                self._postings.setdefault(gram, set()).add(project_id)
+
+    def replace_all(self, rows) -> None:
+        # Full build into fresh structures, swapped in at the end
+        postings: Dict[str, Set[int]] = {}
+        documents: Dict[int, Tuple[str, str]] = {}
+        for row in rows:
+            name, description = normalize(row.name), normalize(row.description)
+            documents[row.id] = (name, description)
+            for gram in document_trigrams(name + " " + description):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = posting = set()
+                posting.add(row.id)
+        with self._lock:
+            self._postings, self._documents = postings, documents
+
+    def remove(self, project_id: int) -> None:
+        with self._lock:
+            self._remove(project_id)
+
+    def discard_missing(self, project_ids: Iterable[int]) -> None:
+        for project_id in project_ids:
+            self.remove(project_id)
+
+    def _remove(self, project_id: int) -> None:
+        document = self._documents.pop(project_id, None)
+        if document is None:
+            return
+        for gram in document_trigrams(document[0] + " " + document[1]):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(project_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, query: str, allowed: Set[int]) -> List[Tuple[int, int]]:
+        # (score, project_id) of every matching project in `allowed`, best first
+        query = normalize(query)
+        grams = query_trigrams(query)
+        with self._lock:
+            postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            candidates = allowed.intersection(postings[0]) if postings else set()
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+            documents = [(pid, self._documents[pid]) for pid in candidates]
+        results = [(score(query, name, description), pid) for pid, (name, description) in documents]
+        return sorted(((s, pid) for s, pid in results if s), key=lambda r: (-r[0], r[1]))
+
+    def _load(self, since: Optional[datetime]) -> int:
+        query = select(Project.id, Project.name, Project.description, Project.updated_at)
+        if since is not None:
+            query = query.where(Project.updated_at >= since)
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+        if since is None:
+            self.replace_all(rows)
+        else:
+            for row in rows:
+                self.add(row.id, row.name, row.description)
+        latest = max((row.updated_at for row in rows if row.updated_at is not None), default=None)
+        if latest is not None:
+            # Re-read a small overlap so rows committed out of order are not missed
+            self._watermark = max(self._watermark or latest, latest) - timedelta(seconds=self.refresh_interval)
+        return len(rows)
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            count = self._load(None)
+        except Exception:
+            logger.exception("Failed to build the project search index")
+        else:
+            self.ready = True
+            logger.info("Project search index built with %d projects in %.1fs", count, time.perf_counter() - started)
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                if self.ready:
+                    self._load(self._watermark)
+                else:
+                    self._load(None)
+                    self.ready = True
+            except Exception:
+                logger.exception("Failed to refresh the project search index")
+
+    def start(self) -> None:
+        # Built in the background; until it is ready searches use the database
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="project-search-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"ready": self.ready, "projects": len(self._documents), "trigrams": len(self._postings)}
+
+project_search = ProjectSearchIndex(refresh_interval=settings.SEARCH_INDEX_REFRESH_SECONDS)
@@ -1,8 +1,13 @@
+from sqlalchemy import select, delete, update, and_, or_
 from sqlalchemy.orm import Session
 from .models import Project, ProjectUserRole
+from .permissions import invalidate_role, invalidate_project_roles
+from .search import normalize, project_search, rank_rows
+from .events import membership_changes, project_events, project_payload
 from core.models import User
-from typing import List, Optional
-from sqlalchemy.orm import joinedload
+from core.database import upsert_statement
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import load_only, selectinload
 
 def create_project(db: Session, name: str, description: Optional[str], owner_id: int) -> Project:
     project = Project(name=name, description=description)
@@ -12,24 +17,99 @@ def create_project(db: Session, name: str, description: Optional[str], owner_id:
     owner_role = ProjectUserRole(user_id=owner_id, project_id=project.id, role="owner")
     db.add(owner_role)
     db.commit()
+    invalidate_role(owner_id, project.id)
+    project_search.add(project.id, project.name, project.description)
     # Eagerly load user_roles so that the owner is included in the response
     db.refresh(project)
+    project_events.publish("project.created", project.id, project_payload(project), added={owner_id})
     return project
 
+# Members are loaded with one extra SELECT per relationship instead of being
+# joined in, so result size does not grow with projects x members
+def members_loader():
+    return selectinload(Project.user_roles).selectinload(ProjectUserRole.user).load_only(
+        User.id, User.email, User.full_name, User.created_at
+    )
+
+# Conditional GETs compare versions first and only load members on a mismatch
+VERSION_COLUMNS = ("id", "version", "members_version")
+
+def project_version_query(project_id: int, user_id: int):
+    # Versions of one project plus the caller's role in it (NULL when not a member)
+    return (
+        select(Project.id, Project.version, Project.members_version, Project.updated_at, ProjectUserRole.role)
+        .outerjoin(ProjectUserRole, and_(ProjectUserRole.project_id == Project.id, ProjectUserRole.user_id == user_id))
+        .where(Project.id == project_id)
+    )
+
+def project_versions_page_query(user_id: int, limit: int, after_id: Optional[int] = None):
+    # Same rows as get_projects_for_user, version columns only
+    query = select(Project.id, Project.version, Project.members_version).join(ProjectUserRole).where(ProjectUserRole.user_id == user_id)
+    if after_id is not None:
+        query = query.where(Project.id > after_id)
+    return query.order_by(Project.id).limit(limit)
+
+def bump_members_version(project_id: int):
+    # Also refreshes updated_at through its onupdate, which feeds Last-Modified
+    return update(Project).where(Project.id == project_id).values(members_version=Project.members_version + 1)
+
+def get_project_version(db: Session, project_id: int, user_id: int):
+    return db.execute(project_version_query(project_id, user_id)).first()
+
+def get_project_versions_for_user(db: Session, user_id: int, limit: int, after_id: Optional[int] = None):
+    return db.execute(project_versions_page_query(user_id, limit, after_id)).all()
+
 def get_project(db: Session, project_id: int) -> Optional[Project]:
-    return db.query(Project).options(
-        joinedload(Project.user_roles).joinedload(ProjectUserRole.user)
-    ).filter(Project.id == project_id).first()
+    return db.query(Project).options(members_loader()).filter(Project.id == project_id).first()
+
+def project_load_options(fields: Optional[Set[str]]) -> list:
+    # `fields` restricts the loaded columns and members are only loaded when "users" is requested
+    options = []
+    if fields is None or "users" in fields:
+        options.append(members_loader())
+    if fields is not None:
+        columns = set(VERSION_COLUMNS) | (fields - {"users"})
+        options.append(load_only(*[getattr(Project, c) for c in columns]))
+    return options
+
+def get_projects_for_user(db: Session, user_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, fields: Optional[Set[str]] = None) -> List[Project]:
+    # Keyset pagination on Project.id
+    query = db.query(Project).join(ProjectUserRole).filter(ProjectUserRole.user_id == user_id)
+    query = query.options(*project_load_options(fields))
+    if after_id is not None:
+        query = query.filter(Project.id > after_id)
+    query = query.order_by(Project.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_projects_by_ids(db: Session, project_ids: List[int], fields: Optional[Set[str]] = None) -> List[Project]:
+    if not project_ids:
+        return []
+    return db.query(Project).options(*project_load_options(fields)).filter(Project.id.in_(project_ids)).all()
 
-def get_projects_for_user(db: Session, user_id: int) -> List[Project]:
+def accessible_projects_query(user_id: int):
+    return select(ProjectUserRole.project_id).where(ProjectUserRole.user_id == user_id)
+
+def get_member_project_ids(db: Session, user_id: int) -> Set[int]:
+    return set(db.scalars(accessible_projects_query(user_id)))
+
+def search_fallback_query(user_id: int, query: str):
+    # Used while the search index is not built (or disabled)
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
     return (
-        db.query(Project)
-        .options(joinedload(Project.user_roles).joinedload(ProjectUserRole.user))
+        select(Project.id, Project.name, Project.description)
         .join(ProjectUserRole)
-        .filter(ProjectUserRole.user_id == user_id)
-        .all()
+        .where(ProjectUserRole.user_id == user_id)
+        .where(or_(Project.name.ilike(pattern, escape="\\"), Project.description.ilike(pattern, escape="\\")))
     )
 
+def search_projects(db: Session, user_id: int, query: str) -> List[Tuple[int, int]]:
+    # Every match among the user's projects as (score, project_id), best first
+    if project_search.ready:
+        return project_search.search(query, set(db.scalars(accessible_projects_query(user_id))))
+    return rank_rows(query, db.execute(search_fallback_query(user_id, normalize(query))).all())
+
 def update_project(db: Session, project_id: int, name: Optional[str], description: Optional[str]) -> Optional[Project]:
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
@@ -38,8 +118,11 @@ def update_project(db: Session, project_id: int, name: Optional[str], descriptio
         project.name = name
     if description is not None:
         project.description = description
+    project.version = Project.version + 1
     db.commit()
     db.refresh(project)
+    project_search.add(project.id, project.name, project.description)
+    project_events.publish("project.updated", project.id, project_payload(project))
     return project
 
 def delete_project(db: Session, project_id: int) -> bool:
@@ -48,6 +131,9 @@ def delete_project(db: Session, project_id: int) -> bool:
         return False
     db.delete(project)
     db.commit()
+    invalidate_project_roles(project_id)
+    project_search.remove(project_id)
+    project_events.publish("project.deleted", project_id, {})
     return True
 
 def get_user_role_for_project(db: Session, user_id: int, project_id: int) -> Optional[str]:
@@ -61,7 +147,10 @@ def set_user_role_for_project(db: Session, user_id: int, project_id: int, role:
     else:
         pur = ProjectUserRole(user_id=user_id, project_id=project_id, role=role)
         db.add(pur)
+    db.execute(bump_members_version(project_id))
     db.commit()
+    invalidate_role(user_id, project_id)
+    project_events.publish("members.changed", project_id, **membership_changes([(user_id, role)]))
     return pur
 
 def remove_user_from_project(db: Session, user_id: int, project_id: int) -> bool:
@@ -69,5 +158,72 @@ def remove_user_from_project(db: Session, user_id: int, project_id: int) -> bool
     if not pur:
         return False
     db.delete(pur)
+    db.execute(bump_members_version(project_id))
+    db.commit()
+    invalidate_role(user_id, project_id)
+    project_events.publish("members.changed", project_id, **membership_changes([(user_id, None)]))
+    return True
+
+UPSERT_CHUNK_SIZE = 500
+
+def plan_membership_batch(project_id: int, upserts: Dict[int, str], removals: List[int], existing_users: Set[int], current: Dict[int, str]) -> Tuple[List[dict], List[int], List[dict]]:
+    # Works out the rows to upsert, the members to delete and a result per user
+    rows, remove_ids, results = [], [], []
+    for user_id, role in upserts.items():
+        previous = current.get(user_id)
+        if user_id not in existing_users:
+            status = "user_not_found"
+        elif previous == role:
+            status = "unchanged"
+        else:
+            rows.append({"user_id": user_id, "project_id": project_id, "role": role})
+            status = "added" if previous is None else "updated"
+        results.append({"user_id": user_id, "status": status, "role": role if status != "user_not_found" else None})
+    for user_id in removals:
+        if user_id in current:
+            remove_ids.append(user_id)
+            results.append({"user_id": user_id, "status": "removed", "role": current[user_id]})
+        else:
+            results.append({"user_id": user_id, "status": "not_member", "role": None})
+    return rows, remove_ids, results
+
+def membership_batch_queries(project_id: int, upserts: Dict[int, str], removals: List[int]):
+    user_ids = set(upserts) | set(removals)
+    return (
+        select(User.id).where(User.id.in_(list(upserts))),
+        select(ProjectUserRole.user_id, ProjectUserRole.role).where(
+            ProjectUserRole.project_id == project_id, ProjectUserRole.user_id.in_(list(user_ids))
+        ),
+    )
+
+def membership_batch_writes(dialect_name: str, project_id: int, rows: List[dict], remove_ids: List[int]) -> list:
+    statements = [
+        upsert_statement(dialect_name, ProjectUserRole.__table__, rows[i:i + UPSERT_CHUNK_SIZE], ["user_id", "project_id"], update_columns=["role"])
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE)
+    ]
+    if remove_ids:
+        statements.append(delete(ProjectUserRole).where(
+            ProjectUserRole.project_id == project_id, ProjectUserRole.user_id.in_(remove_ids)
+        ))
+    if statements:
+        statements.append(bump_members_version(project_id))
+    return statements
+
+def publish_membership_batch(project_id: int, rows: List[dict], remove_ids: List[int]) -> None:
+    changes = [(row["user_id"], row["role"]) for row in rows] + [(user_id, None) for user_id in remove_ids]
+    if changes:
+        project_events.publish("members.changed", project_id, **membership_changes(changes))
+
+def apply_membership_batch(db: Session, project_id: int, upserts: Dict[int, str], removals: List[int]) -> List[dict]:
+    # Adds, updates and removes many memberships in one transaction
+    users_query, members_query = membership_batch_queries(project_id, upserts, removals)
+    existing_users = set(db.scalars(users_query)) if upserts else set()
+    current = dict(db.execute(members_query).all())
+    rows, remove_ids, results = plan_membership_batch(project_id, upserts, removals, existing_users, current)
+    for statement in membership_batch_writes(db.get_bind().dialect.name, project_id, rows, remove_ids):
+        db.execute(statement)
     db.commit()
-    return True 
\ No newline at end of file
+    for user_id in [row["user_id"] for row in rows] + remove_ids:
+        invalidate_role(user_id, project_id)
+    publish_membership_batch(project_id, rows, remove_ids)
+    return results